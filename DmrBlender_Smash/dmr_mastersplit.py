@@ -1,6 +1,10 @@
 import bpy
 import shutil
 import os
+import sys
+import re
+import hashlib
+import concurrent.futures
 
 classlist=  []
 
@@ -22,33 +26,259 @@ def TryMakeDir(path):
 
 # ----------------------------------------------------------------------------------
 
-def ReplaceTextInFile(fpath, oldstring, newstring):
-    oldstring = str(oldstring)
-    newstring = str(newstring)
-    
-    if os.path.isfile(fpath):
-        #print("> Replacing text in \"%s\"" % fpath)
-        try:
-            f = open(fpath, 'r')
-            ftext = f.read().replace(oldstring, newstring)
-            f.close()
-            f = open(fpath, 'w')
-            f.write(ftext)
-            f.close()
-        except:
-            oldstring = oldstring.encode('utf-16-le')
-            newstring = newstring.encode('utf-16-le')
-            
-            f = open(fpath, 'rb')
-            
-            ftext = f.read().replace(oldstring, newstring)
-            f.close()
+TEXTBOMS = (
+    (b'\xef\xbb\xbf', 'utf-8'),
+    (b'\xff\xfe', 'utf-16-le'),
+    (b'\xfe\xff', 'utf-16-be'),
+)
+
+# Returns encoding of file data. BOMs are kept in decoded text so they survive rewriting
+def DetectEncoding(data):
+    for bom, encoding in TEXTBOMS:
+        if data[:len(bom)] == bom:
+            return encoding
+    
+    # BOM-less UTF-16 ascii text is also valid UTF-8 as nulls are legal, so check null bytes first
+    if len(data) % 2 == 0:
+        if data[1::2].count(0) > len(data) // 4:
+            return 'utf-16-le'
+        if data[0::2].count(0) > len(data) // 4:
+            return 'utf-16-be'
+    
+    try:
+        data.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+# Applies all {oldstring: newstring} replacements in one read and one write
+# Returns list of placeholders that weren't found, or None if file doesn't exist
+def ReplaceTextInFile(fpath, replacements):
+    if not os.path.isfile(fpath):
+        return None
+    
+    with open(fpath, 'rb') as f:
+        data = f.read()
+    
+    encoding = DetectEncoding(data)
+    text = data.decode(encoding)
+    
+    replacements = {str(k): str(v) for k,v in replacements.items()}
+    matched = set()
+    
+    def Replace(m):
+        matched.add(m.group(0))
+        return replacements[m.group(0)]
+    
+    pattern = re.compile("|".join(re.escape(x) for x in sorted(replacements, key=len, reverse=True)))
+    newtext = pattern.sub(Replace, text)
+    
+    if newtext != text:
+        with open(fpath, 'wb') as f:
+            f.write(newtext.encode(encoding))
+    
+    return [x for x in replacements if x not in matched]
+
+COPYCHUNKSIZE = 1 << 20
+
+# Source -> destinations copy plan. Later writes to a destination replace earlier ones
+class SplitPlan():
+    def __init__(self):
+        self.destmap = {}   # destpath -> srcpath
+        self.replacements = {}  # fpath -> {oldstring: newstring}
+        self.unmatched = {}     # fpath -> [placeholder, ...] or None if file is missing
+    
+    def __len__(self):
+        return len(self.destmap)
+    
+    def AddCopy(self, srcpath, destpath):
+        self.destmap.pop(destpath, None)
+        self.destmap[destpath] = srcpath
+    
+    def AddReplace(self, fpath, oldstring, newstring):
+        self.replacements.setdefault(os.path.normpath(fpath), {})[str(oldstring)] = str(newstring)
+    
+    def Merge(self, other):
+        for destpath, srcpath in other.destmap.items():
+            self.AddCopy(srcpath, destpath)
+        for fpath, replacements in other.replacements.items():
+            self.replacements.setdefault(fpath, {}).update(replacements)
+        return self
+    
+    # Returns {srcpath: [destpath, ...]}
+    def Sources(self):
+        sources = {}
+        for destpath, srcpath in self.destmap.items():
+            sources.setdefault(srcpath, []).append(destpath)
+        return sources
+    
+    def Print(self):
+        sources = self.Sources()
+        print("> Copy plan: %d sources -> %d destinations" % (len(sources), len(self.destmap)))
+        for srcpath, destpaths in sources.items():
+            print(srcpath)
+            for destpath in destpaths:
+                print("    -> " + destpath)
+        for fpath, replacements in self.replacements.items():
+            print('> Replace %s in %s' % (", ".join('"%s" -> "%s"' % x for x in replacements.items()), fpath))
+    
+    # Returns (bytes copied, bytes linked, bytes skipped)
+    def Execute(self, threads=0, skip_mode='NONE', link_mode='NONE'):
+        sources = self.Sources()
+        
+        # Files that get text replaced per slot can't share data
+        nolink = set(x for x in self.destmap if os.path.normpath(x) in self.replacements)
+        
+        stats = [0, 0, 0]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads or None) as executor:
+            futures = [
+                executor.submit(CopyToMany, srcpath, destpaths, skip_mode, link_mode, nolink) 
+                for srcpath, destpaths in sources.items()
+            ]
+            for future in futures:
+                stats = [a+b for a,b in zip(stats, future.result())]
+        
             
-            f = open(fpath, 'wb')
-            f.write(ftext)
-            f.close()
+            # Templates are filled once all files are in place
+            fpaths = list(self.replacements.keys())
+            results = executor.map(ReplaceTextInFile, fpaths, [self.replacements[x] for x in fpaths])
+            self.unmatched = {fpath: result for fpath, result in zip(fpaths, results) if result != []}
+        
+        return tuple(stats)
+
+# Returns {relative directory: (dirnames, filenames)} from one walk of the tree
+def ScanDirectory(rootpath):
+    listing = {}
+    for fullpath, dirnames, fnames in os.walk(rootpath):
+        relpath = os.path.relpath(fullpath, rootpath).replace("\\", "/")
+        listing["" if relpath == "." else relpath + "/"] = (list(dirnames), list(fnames))
+    return listing
+
+# Reads source once and writes it to every destination. Returns (bytes copied, bytes linked, bytes skipped)
+def CopyToMany(srcpath, destpaths, skip_mode='NONE', link_mode='NONE', nolink=()):
+    srcstat = os.stat(srcpath)
+    size = srcstat.st_size
+    srchash = []
+    
+    # Incremental skip
+    writepaths = []
+    for destpath in destpaths:
+        if skip_mode != 'NONE' and DestinationUnchanged(srcpath, srcstat, destpath, skip_mode, srchash):
+            continue
+        writepaths.append(destpath)
+    
+    skipped = size * (len(destpaths) - len(writepaths))
+    if not writepaths:
+        return (0, 0, skipped)
+    
+    # One physical copy is made for linkable destinations, the rest are linked to it
+    linkpaths = []
+    if link_mode != 'NONE':
+        linkpaths = [x for x in writepaths if x not in nolink]
+        writepaths = [x for x in writepaths if x in nolink] + linkpaths[:1]
+        linkpaths = linkpaths[1:]
+    
+    for destpath in writepaths + linkpaths:
+        TryMakeDir(destpath)
+        # Writing into an existing hardlink would change every file sharing it
+        if os.path.lexists(destpath):
+            os.remove(destpath)
+    
+    copypaths = []
+    linked = 0
+    if link_mode == 'REFLINK':
+        for destpath in writepaths:
+            if not TryReflink(srcpath, destpath):
+                copypaths.append(destpath)
+        linked += size * (len(writepaths) - len(copypaths))
     else:
-        print("> No file found for replacing: \"%s\"" % fpath)
+        copypaths = writepaths
+    
+    if len(copypaths) == 1:
+        shutil.copy2(srcpath, copypaths[0])
+    elif copypaths:
+        destfiles = [open(destpath, 'wb') for destpath in copypaths]
+        try:
+            with open(srcpath, 'rb') as f:
+                chunk = f.read(COPYCHUNKSIZE)
+                while chunk:
+                    for destfile in destfiles:
+                        destfile.write(chunk)
+                    chunk = f.read(COPYCHUNKSIZE)
+        finally:
+            for destfile in destfiles:
+                destfile.close()
+        
+        for destpath in copypaths:
+            shutil.copystat(srcpath, destpath)
+    
+    for destpath in linkpaths:
+        if (link_mode == 'HARDLINK' and TryHardlink(writepaths[-1], destpath)) or (link_mode == 'REFLINK' and TryReflink(srcpath, destpath)):
+            linked += size
+        else:
+            shutil.copy2(srcpath, destpath)
+            copypaths.append(destpath)
+    
+    return (size * len(copypaths), linked, skipped)
+
+# Returns True if destination already holds the source's data
+def DestinationUnchanged(srcpath, srcstat, destpath, skip_mode, srchash):
+    try:
+        deststat = os.stat(destpath)
+    except OSError:
+        return False
+    
+    if deststat.st_size != srcstat.st_size:
+        return False
+    
+    if skip_mode == 'MTIME':
+        # FAT timestamps have 2 second resolution
+        return abs(deststat.st_mtime - srcstat.st_mtime) < 2.0
+    
+    if not srchash:
+        srchash.append(FileHash(srcpath))
+    return FileHash(destpath) == srchash[0]
+
+def FileHash(fpath):
+    h = hashlib.blake2b()
+    with open(fpath, 'rb') as f:
+        chunk = f.read(COPYCHUNKSIZE)
+        while chunk:
+            h.update(chunk)
+            chunk = f.read(COPYCHUNKSIZE)
+    return h.digest()
+
+def TryHardlink(srcpath, destpath):
+    try:
+        os.link(srcpath, destpath)
+        return True
+    except (OSError, NotImplementedError):
+        return False
+
+# Copy-on-write clone. Only supported on Linux filesystems with FICLONE (btrfs, xfs)
+def TryReflink(srcpath, destpath):
+    if not sys.platform.startswith("linux"):
+        return False
+    
+    import fcntl
+    FICLONE = 0x40049409
+    
+    try:
+        with open(srcpath, 'rb') as src, open(destpath, 'wb') as dest:
+            fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+    except OSError:
+        if os.path.exists(destpath):
+            os.remove(destpath)
+        return False
+    
+    shutil.copystat(srcpath, destpath)
+    return True
+
+def FormatBytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return ("%d %s" % (n, unit)) if unit == "B" else ("%.2f %s" % (n, unit))
+        n /= 1024
 
 '# ==================================================================================================='
 '# PROPERTY GROUPS'
@@ -74,6 +304,19 @@ class CSplit_SplitMaster(bpy.types.PropertyGroup):
     
     split_char : bpy.props.StringProperty(name="Split Char", default="X")
     
+    dry_run : bpy.props.BoolProperty(name="Dry Run", default=False, description="Print copy plan instead of copying files")
+    threads : bpy.props.IntProperty(name="Threads", default=0, min=0, description="Number of copy threads. 0 = Automatic")
+    skip_mode : bpy.props.EnumProperty(name="Skip Unchanged", default='NONE', items=(
+        ('NONE', "Copy All", "Copy every file"),
+        ('MTIME', "Size & Time", "Skip destinations with matching size and modified time"),
+        ('HASH', "Content Hash", "Skip destinations with matching content"),
+    ))
+    link_mode : bpy.props.EnumProperty(name="Link Mode", default='NONE', items=(
+        ('NONE', "Copy", "Write a full copy to every destination"),
+        ('HARDLINK', "Hardlink", "Copy once and hardlink other destinations to it"),
+        ('REFLINK', "Reflink", "Clone source with copy-on-write. Falls back to copying when unsupported"),
+    ))
+    
     def AddEntry(self):
         self.csplit_entries.add().name = self.csplit_entries[self.csplit_entries_index].name if self.csplit_entries else "filename.ext"
     
@@ -83,8 +326,8 @@ class CSplit_SplitMaster(bpy.types.PropertyGroup):
     def SplitFiles(self):
         print("> Splitting files...")
         
-        sourcefolder = os.path.realpath(bpy.path.abspath(bpy.context.scene.csplit_source))
-        destfolder = os.path.realpath(bpy.path.abspath(bpy.context.scene.csplit_destination))
+        sourcefolder = os.path.realpath(bpy.path.abspath(self.csplit_source))
+        destfolder = os.path.realpath(bpy.path.abspath(self.csplit_destination))
         
         cindices = ["c0" + str(i) for i,c in enumerate(self.master_indices) if c]
         print(cindices)
@@ -97,15 +340,17 @@ class CSplit_SplitMaster(bpy.types.PropertyGroup):
         ]
         
         # Copy Files
+        plan = SplitPlan()
         for fpath in filenames:
-            for cindex in cindices:
-                srcpath = sourcefolder + "\\" + fpath
-                destpath = destfolder + "\\" + cindex + "\\" + fpath
-                
-                if os.path.exists(srcpath):
-                    shutil.copy2(srcpath, destpath)
-                else:
-                    print('> Path invalid: "%s"' % srcpath)
+            srcpath = sourcefolder + "/" + fpath
+            
+            if os.path.exists(srcpath):
+                for cindex in cindices:
+                    plan.AddCopy(srcpath, destfolder + "/" + cindex + "/" + fpath)
+            else:
+                print('> Path invalid: "%s"' % srcpath)
+        
+        return self.RunPlan(plan)
     
     def SplitMaster(self):
         modname = self.modname
@@ -113,14 +358,38 @@ class CSplit_SplitMaster(bpy.types.PropertyGroup):
         masterpath = self.masterpath
         outpath = self.outpath
         
+        listing = ScanDirectory(os.path.realpath(bpy.path.abspath(masterpath)))
+        plan = SplitPlan()
+        
         # Split Mods
         for i in indices:
-            self.SplitMod(masterpath, outpath + modname + (" c0%d" % i) + "/", [i], False)
+            plan.Merge(self.PlanMod(masterpath, outpath + modname + (" c0%d" % i) + "/", [i], False, listing))
         
         # All
-        self.SplitMod(masterpath, outpath + modname + "/", indices, True)
+        plan.Merge(self.PlanMod(masterpath, outpath + modname + "/", indices, True, listing))
+        
+        return self.RunPlan(plan)
     
     def SplitMod(self, masterpath, outpath, cindices=range(0,8), all_slots=True):
+        return self.RunPlan(self.PlanMod(masterpath, outpath, cindices, all_slots))
+    
+    # Prints plan on dry run, otherwise copies files
+    def RunPlan(self, plan):
+        if self.dry_run:
+            plan.Print()
+        else:
+            print("> Copying %d files..." % len(plan))
+            copied, linked, skipped = plan.Execute(self.threads, self.skip_mode, self.link_mode)
+            print("> Copied %s, linked %s, skipped %s" % (FormatBytes(copied), FormatBytes(linked), FormatBytes(skipped)))
+            
+            for fpath, placeholders in plan.unmatched.items():
+                if placeholders == None:
+                    print('> No file found for replacing: "%s"' % fpath)
+                else:
+                    print('> Unmatched placeholders %s in "%s"' % (placeholders, fpath))
+        return plan
+    
+    def PlanMod(self, masterpath, outpath, cindices=range(0,8), all_slots=True, listing=None):
         """
             Files evaluate reverse alphabetically
             
@@ -167,15 +436,18 @@ class CSplit_SplitMaster(bpy.types.PropertyGroup):
         def Basename(name):
             return name[:name.find(".")]
         
+        if listing == None:
+            listing = ScanDirectory(masterpath)
+        plan = SplitPlan()
+        
         def CopyFile(srcpth, destpth):
-            TryMakeDir(destpth)
-            shutil.copy2(srcpth, destpth)
+            plan.AddCopy(srcpth, destpth)
         
         def Split(currentpath, currentoutpath):
-            walk = list(os.walk(masterpath + currentpath))
+            walk = listing.get(currentpath)
             
             if walk:
-                fullpath, dirnames, fnames = walk[0]
+                dirnames, fnames = walk
                 nextdirs = [d for d in dirnames if d not in excludedir]
                 
                 cXXindices = cXXorder[0]
@@ -204,7 +476,7 @@ class CSplit_SplitMaster(bpy.types.PropertyGroup):
                     return
                 print("<root>/"+currentoutpath)
                 
-                fnames.sort(key=lambda x: "-c__" not in x)
+                fnames = sorted(fnames, key=lambda x: "-c__" not in x)
                 
                 validextlist = ROOTEXTENSIONS if currentoutpath == "" else VALIDEXTENSIONS
                 
@@ -276,12 +548,13 @@ class CSplit_SplitMaster(bpy.types.PropertyGroup):
         Split("", "")
         
         if dosplit:
-            ReplaceTextInFile(outpath+"config.json", "cXX", "c0%d" % cindices[0])
-            ReplaceTextInFile(outpath+"/ui/message/msg_name.xmsbt", "_XX", "_0%d" % cindices[0])
-            ReplaceTextInFile(outpath+"/info.toml", "[INDEX]", str(cindices[0]).zfill(2))
-            ReplaceTextInFile(outpath+"/info.toml", "[COLOR]", cindices[0]+1)
+            plan.AddReplace(outpath+"config.json", "cXX", "c0%d" % cindices[0])
+            plan.AddReplace(outpath+"/ui/message/msg_name.xmsbt", "_XX", "_0%d" % cindices[0])
+            plan.AddReplace(outpath+"/info.toml", "[INDEX]", str(cindices[0]).zfill(2))
+            plan.AddReplace(outpath+"/info.toml", "[COLOR]", cindices[0]+1)
         
         print(cindices)
+        return plan
 
 classlist.append(CSplit_SplitMaster)
 
@@ -386,7 +659,9 @@ class CSPLIT_OT_Split(bpy.types.Operator):
         return context.scene.csplit_master.GetActive()
     
     def execute(self, context):
-        context.scene.csplit_master.GetActive().SplitFiles()
+        plan = context.scene.csplit_master.GetActive().SplitFiles()
+        if plan.unmatched:
+            self.report({'WARNING'}, "%d template file(s) missing or with unmatched placeholders. See console" % len(plan.unmatched))
         return {'FINISHED'}
 classlist.append(CSPLIT_OT_Split)
 
@@ -434,7 +709,9 @@ class CSPLIT_OT_MasterSplit(bpy.types.Operator):
         return context.scene.csplit_master.GetActive()
     
     def execute(self, context):
-        context.scene.csplit_master.GetActive().SplitMaster()
+        plan = context.scene.csplit_master.GetActive().SplitMaster()
+        if plan.unmatched:
+            self.report({'WARNING'}, "%d template file(s) missing or with unmatched placeholders. See console" % len(plan.unmatched))
         return {'FINISHED'}
 classlist.append(CSPLIT_OT_MasterSplit)
 
@@ -495,6 +772,12 @@ class CSPLIT_PT_CSplit_MasterSplit(bpy.types.Panel):
             r = b.column().row(align=1)
             for i in range(0, 8):
                 r.prop(csplit, 'master_indices', text=str(i), index=i, toggle=1)
+            r = b.row(align=1)
+            r.prop(csplit, 'dry_run', toggle=1)
+            r.prop(csplit, 'threads')
+            r = b.row(align=1)
+            r.prop(csplit, 'skip_mode', text="")
+            r.prop(csplit, 'link_mode', text="")
             b.operator('dmrsmash.master_split')
         
 classlist.append(CSPLIT_PT_CSplit_MasterSplit)
@@ -526,6 +809,12 @@ class CSPLIT_PT_CSplit_FileSplit(bpy.types.Panel):
                 csplit, "csplit_entries_index", 
                 rows=4)
             
+            r = b.row(align=1)
+            r.prop(csplit, 'dry_run', toggle=1)
+            r.prop(csplit, 'threads')
+            r = b.row(align=1)
+            r.prop(csplit, 'skip_mode', text="")
+            r.prop(csplit, 'link_mode', text="")
             b.operator('dmrsmash.csplit')
         
 classlist.append(CSPLIT_PT_CSplit_FileSplit)
@@ -12,6 +12,10 @@ bl_info = {
 import bpy
 import xml.etree.ElementTree as ET
 import csv
+import os
+import struct
+import zlib
+import numpy as np
 import math
 import mathutils
 import bmesh
@@ -89,47 +93,47 @@ def SwingSceneNames(self=None, context=bpy.context):
 
 "========================================================================================================="
 
-def SerializeValue(vartype, attribname, attribvalue, value, tabs=0):
-    return TABSTRING*tabs + '<{0} {1}="{2}">{3}</{0}>'.format(vartype, attribname, attribvalue, value) + "\n"
+TABSTRINGS = tuple(TABSTRING*i for i in range(32))
+XMLWRITEBUFFERSIZE = 1 << 16
 
-def SerializeFloat(hash, value, tabs=0):
-    return SerializeValue('float', "hash", hash, value, tabs)
+# Serializers write directly to an open text file instead of building strings
+def SerializeValue(file, vartype, attribname, attribvalue, value, tabs=0):
+    file.write('%s<%s %s="%s">%s</%s>\n' % (TABSTRINGS[tabs], vartype, attribname, attribvalue, value, vartype))
 
-def SerializeSbyte(hash, value, tabs=0):
-    return SerializeValue('sbyte', "hash", hash, value, tabs)
+def SerializeFloat(file, hash, value, tabs=0):
+    SerializeValue(file, 'float', "hash", hash, value, tabs)
 
-def SerializeInt(hash, value, tabs=0):
-    return SerializeValue('int', "hash", hash, value, tabs)
+def SerializeSbyte(file, hash, value, tabs=0):
+    SerializeValue(file, 'sbyte', "hash", hash, value, tabs)
 
-def SerializeString(hash, value, tabs=0):
-    return SerializeValue('hash40', "hash", hash, value, tabs)
+def SerializeInt(file, hash, value, tabs=0):
+    SerializeValue(file, 'int', "hash", hash, value, tabs)
 
-def SerializeList(hash, collectionprop, tabs=0):
+def SerializeString(file, hash, value, tabs=0):
+    SerializeValue(file, 'hash40', "hash", hash, value, tabs)
+
+def SerializeList(file, hash, collectionprop, tabs=0):
     if len(collectionprop) > 0:
-        return (
-            TABSTRING*tabs + '<list size="{0}" hash="{1}">\n'.format(len(collectionprop), hash) +
-            "".join([ x.Serialize(tabs+1, i) for i,x in enumerate(collectionprop) ]) +
-            TABSTRING*tabs + '</list>\n'
-            )
+        file.write('%s<list size="%d" hash="%s">\n' % (TABSTRINGS[tabs], len(collectionprop), hash))
+        for i,x in enumerate(collectionprop):
+            x.Serialize(file, tabs+1, i)
+        file.write(TABSTRINGS[tabs] + '</list>\n')
     else:
-        return TABSTRING*tabs + '<list size="{0}" hash="{1}" />\n'.format(len(collectionprop), hash)
+        file.write('%s<list size="%d" hash="%s" />\n' % (TABSTRINGS[tabs], len(collectionprop), hash))
     
-def SerializeListOfStructs(hash, collectionprop, tabs=0):
+def SerializeListOfStructs(file, hash, collectionprop, tabs=0):
     if len(collectionprop) > 0:
-        return (
-            TABSTRING*tabs + '<list size="{0}" hash="{1}">\n'.format(len(collectionprop), hash) +
-            "".join([ SerializeStruct(x, tabs+1, i) for i,x in enumerate(collectionprop) ]) +
-            TABSTRING*tabs + '</list>\n'
-            )
+        file.write('%s<list size="%d" hash="%s">\n' % (TABSTRINGS[tabs], len(collectionprop), hash))
+        for i,x in enumerate(collectionprop):
+            SerializeStruct(file, x, tabs+1, i)
+        file.write(TABSTRINGS[tabs] + '</list>\n')
     else:
-        return TABSTRING*tabs + '<list size="{0}" hash="{1}" />\n'.format(len(collectionprop), hash)
+        file.write('%s<list size="%d" hash="%s" />\n' % (TABSTRINGS[tabs], len(collectionprop), hash))
 
-def SerializeStruct(structentry, tabs=0, index=-1):
-    return (
-        TABSTRING*tabs + "<struct" + (' index="{0}"'.format(index) if index>=0 else "") + ">\n" +
-        structentry.Serialize(tabs+1) +
-        TABSTRING*tabs + "</struct>\n"
-    )
+def SerializeStruct(file, structentry, tabs=0, index=-1):
+    file.write(TABSTRINGS[tabs] + ('<struct index="%d">\n' % index if index>=0 else "<struct>\n"))
+    structentry.Serialize(file, tabs+1)
+    file.write(TABSTRINGS[tabs] + "</struct>\n")
 
 "========================================================================================================="
 
@@ -180,139 +184,190 @@ def XMLElement(element, typename, hashname):
         if el.get("hash") == hashname:
             return el
 
+def XMLElementMap(element):
+    return {el.get("hash"): el for el in element if el.get("hash") is not None}
+
+# (attribute, caster, required) for each struct type found in swing xml
+XMLFIELDS = {
+    'BONE': (
+        ('name', str, True), ('start_bonename', str, True), ('end_bonename', str, True),
+        ('isskirt', int, True), ('rotateorder', int, True), ('curverotatex', int, True),
+        ('0x0f7316a113', int, False),
+    ),
+    'PARAMS': (
+        ('airresistance', float, True), ('waterresistance', float, True),
+        ('minanglez', float, True), ('maxanglez', float, True),
+        ('minangley', float, True), ('maxangley', float, True),
+        ('collisionsizetip', float, True), ('collisionsizeroot', float, True),
+        ('frictionrate', float, True), ('goalstrength', float, True),
+        ('0x0cc10e5d3a', float, False),
+        ('localgravity', float, True), ('fallspeedscale', float, True),
+        ('groundhit', int, True), ('windaffect', float, True),
+    ),
+    'SPHERE': (
+        ('name', str, True), ('bonename', str, True),
+        ('cx', float, True), ('cy', float, True), ('cz', float, True), ('radius', float, True),
+    ),
+    'OVAL': (
+        ('name', str, True), ('bonename', str, True),
+        ('cx', float, True), ('cy', float, True), ('cz', float, True), ('radius', float, True),
+    ),
+    'ELLIPSOID': (
+        ('name', str, True), ('bonename', str, True),
+        ('cx', float, True), ('cy', float, True), ('cz', float, True),
+        ('rx', float, True), ('ry', float, True), ('rz', float, True),
+        ('sx', float, True), ('sy', float, True), ('sz', float, True),
+    ),
+    'CAPSULE': (
+        ('name', str, True), ('start_bonename', str, True), ('end_bonename', str, True),
+        ('start_offset_x', float, True), ('start_offset_y', float, True), ('start_offset_z', float, True),
+        ('end_offset_x', float, True), ('end_offset_y', float, True), ('end_offset_z', float, True),
+        ('start_radius', float, True), ('end_radius', float, True),
+    ),
+    'PLANE': (
+        ('name', str, True), ('bonename', str, True),
+        ('nx', float, True), ('ny', float, True), ('nz', float, True), ('distance', float, True),
+    ),
+    'CONNECTION': (
+        ('start_bonename', str, True), ('end_bonename', str, True),
+        ('radius', float, True), ('length', float, True),
+    ),
+}
+
+XMLLISTTYPES = {
+    'swingbones': 'BONE',
+    'spheres': 'SPHERE',
+    'ovals': 'OVAL',
+    'ellipsoids': 'ELLIPSOID',
+    'capsules': 'CAPSULE',
+    'planes': 'PLANE',
+    'connections': 'CONNECTION',
+}
+
+# Returns list of (attribute, value) for struct using a single pass over its children
+def XMLStructValues(struct_def, fields, elementmap=None):
+    elementmap = elementmap if elementmap != None else XMLElementMap(struct_def)
+    values = []
+    
+    for hashname, caster, required in fields:
+        el = elementmap.get(hashname)
+        if el == None:
+            if required:
+                print("WARNING: No value found for \"%s\"" % hashname)
+            continue
+        
+        attribname = ("unknown_" + hashname) if hashname[:2] == "0x" else hashname
+        values.append((attribname, caster(el.text) if caster != str else (el.text or "")))
+    return values
+
 def XMLToSwingEdit(self, context, path):
     xml = ET.parse(path)
     
-    armatureobject = context.object
-    collection = bpy.context.collection
-    
     prc = context.scene.swing_ultimate.GetActiveData()
     prc.Clear()
-    swingmap = {}
     
     for el in xml.getroot():
-        # Swing Bones
-        if el.attrib["hash"] == "swingbones":
-            for struct_def in el.findall("struct"):
-                entry = prc.AddStruct('BONE')
-                entry.name = XMLValue(struct_def, 'hash40', "name")
-                entry.start_bonename = XMLValue(struct_def, 'hash40', "start_bonename")
-                entry.end_bonename = XMLValue(struct_def, 'hash40', "end_bonename")
-                entry.isskirt = int(XMLValueAny(struct_def, "isskirt"))
-                entry.rotateorder = int(XMLValueAny(struct_def, "rotateorder"))
-                entry.curverotatex = int(XMLValueAny(struct_def, "curverotatex"))
-                unknown_0x0f7316a113 = XMLValueAny(struct_def, "0x0f7316a113")
-                
-                if unknown_0x0f7316a113:
-                    entry.unknown_0x0f7316a113 = int(unknown_0x0f7316a113)
-                
-                for param_def in XMLElement(struct_def, "list", "params"):
-                    paramentry = entry.AddParams()
-                    
-                    paramentry.airresistance = float(XMLValue(param_def, 'float', "airresistance"))
-                    paramentry.waterresistance = float(XMLValue(param_def, 'float', "waterresistance"))
-                    paramentry.minanglez = float(XMLValue(param_def, 'float', "minanglez"))
-                    paramentry.maxanglez = float(XMLValue(param_def, 'float', "maxanglez"))
-                    paramentry.minangley = float(XMLValue(param_def, 'float', "minangley"))
-                    paramentry.maxangley = float(XMLValue(param_def, 'float', "maxangley"))
-                    paramentry.collisionsizetip = float(XMLValue(param_def, 'float', "collisionsizetip"))
-                    paramentry.collisionsizeroot = float(XMLValue(param_def, 'float', "collisionsizeroot"))
-                    paramentry.frictionrate = float(XMLValue(param_def, 'float', "frictionrate"))
-                    paramentry.goalstrength = float(XMLValue(param_def, 'float', "goalstrength"))
-                    unknown_0x0cc10e5d3a = XMLValue(param_def, 'float', "0x0cc10e5d3a")
-                    if unknown_0x0cc10e5d3a:
-                        paramentry.unknown_0x0cc10e5d3a = float(unknown_0x0cc10e5d3a)
-                    paramentry.localgravity = float(XMLValue(param_def, 'float', "localgravity"))
-                    paramentry.fallspeedscale = float(XMLValue(param_def, 'float', "fallspeedscale"))
-                    paramentry.groundhit = int(XMLValue(param_def, 'sbyte', "groundhit"))
-                    paramentry.windaffect = float(XMLValue(param_def, 'float', "windaffect"))
-                    
-                    for collision_def in XMLElement(param_def, "list", "collisions"):
-                        paramentry.AddCollision( collision_def.text )
-                
-        # Spheres
-        elif el.attrib["hash"] == "spheres":
-            for struct_def in el.findall("struct"):
-                entry = prc.AddStruct('SPHERE')
-                entry.name = XMLValue(struct_def, 'hash40', "name")
-                entry.bonename = XMLValue(struct_def, 'hash40', "bonename")
-                entry.cx = float(XMLValue(struct_def, 'float', "cx"))
-                entry.cy = float(XMLValue(struct_def, 'float', "cy"))
-                entry.cz = float(XMLValue(struct_def, 'float', "cz"))
-                entry.radius = float(XMLValue(struct_def, 'float', "radius"))
-                
-                
-        
-        # Ovals
-        elif el.attrib["hash"] == "ovals":
-            for struct_def in el.findall("struct"):
-                entry = prc.AddStruct('OVAL')
-                entry.name = XMLValue(struct_def, 'hash40', "name")
-                entry.bonename = XMLValue(struct_def, 'hash40', "bonename")
-                entry.cx = float(XMLValue(struct_def, 'float', "cx"))
-                entry.cy = float(XMLValue(struct_def, 'float', "cy"))
-                entry.cz = float(XMLValue(struct_def, 'float', "cz"))
-                entry.radius = float(XMLValue(struct_def, 'float', "radius"))
-        
-        # Ellipsoids
-        elif el.attrib["hash"] == "ellipsoids":
-            for struct_def in el.findall("struct"):
-                entry = prc.AddStruct('ELLIPSOID')
-                entry.name = XMLValue(struct_def, 'hash40', "name")
-                entry.bonename = XMLValue(struct_def, 'hash40', "bonename")
-                entry.cx = float(XMLValue(struct_def, 'float', "cx"))
-                entry.cy = float(XMLValue(struct_def, 'float', "cy"))
-                entry.cz = float(XMLValue(struct_def, 'float', "cz"))
-                entry.rx = float(XMLValue(struct_def, 'float', "rx"))
-                entry.ry = float(XMLValue(struct_def, 'float', "ry"))
-                entry.rz = float(XMLValue(struct_def, 'float', "rz"))
-                entry.sx = float(XMLValue(struct_def, 'float', "sx"))
-                entry.sy = float(XMLValue(struct_def, 'float', "sy"))
-                entry.sz = float(XMLValue(struct_def, 'float', "sz"))
-        
-        # Capsules
-        elif el.attrib["hash"] == "capsules":
-            for struct_def in el.findall("struct"):
-                entry = prc.AddStruct('CAPSULE')
-                entry.name = XMLValue(struct_def, 'hash40', "name")
-                entry.start_bonename = XMLValue(struct_def, 'hash40', "start_bonename")
-                entry.end_bonename = XMLValue(struct_def, 'hash40', "end_bonename")
-                entry.start_offset_x = float(XMLValue(struct_def, 'float', "start_offset_x"))
-                entry.start_offset_y = float(XMLValue(struct_def, 'float', "start_offset_y"))
-                entry.start_offset_z = float(XMLValue(struct_def, 'float', "start_offset_z"))
-                entry.end_offset_x = float(XMLValue(struct_def, 'float', "end_offset_x"))
-                entry.end_offset_y = float(XMLValue(struct_def, 'float', "end_offset_y"))
-                entry.end_offset_z = float(XMLValue(struct_def, 'float', "end_offset_z"))
-                entry.start_radius = float(XMLValue(struct_def, 'float', "start_radius"))
-                entry.end_radius = float(XMLValue(struct_def, 'float', "end_radius"))
-        
-        # Planes
-        elif el.attrib["hash"] == "planes":
-            for struct_def in el.findall("struct"):
-                entry = prc.AddStruct('PLANE')
-                entry.name = XMLValue(struct_def, 'hash40', "name")
-                entry.bonename = XMLValue(struct_def, 'hash40', "bonename")
-                entry.nx = float(XMLValue(struct_def, 'float', "nx"))
-                entry.ny = float(XMLValue(struct_def, 'float', "ny"))
-                entry.nz = float(XMLValue(struct_def, 'float', "nz"))
-                entry.distance = float(XMLValue(struct_def, 'float', "distance"))
-        
-        # Connections
-        elif el.attrib["hash"] == "connections":
-            for struct_def in el.findall("struct"):
-                entry = prc.AddStruct('CONNECTION')
-                entry.start_bonename = XMLValue(struct_def, 'hash40', "start_bonename")
-                entry.end_bonename = XMLValue(struct_def, 'hash40', "end_bonename")
-                entry.radius = float(XMLValue(struct_def, 'float', "radius"))
-                entry.length = float(XMLValue(struct_def, 'float', "length"))
+        listhash = el.get("hash")
+        type = XMLLISTTYPES.get(listhash)
         
         # Groups
-        else:
+        if type == None:
             entry = prc.AddStruct('GROUP')
-            entry.name = el.attrib["hash"]
+            entry.name = listhash
             
             for group_def in el:
                 entry.Add( group_def.text )
+            continue
+        
+        for struct_def in el.findall("struct"):
+            elementmap = XMLElementMap(struct_def)
+            entry = prc.AddStruct(type)
+            
+            for attribname, value in XMLStructValues(struct_def, XMLFIELDS[type], elementmap):
+                setattr(entry, attribname, value)
+            
+            # Swing Bone Params
+            if type == 'BONE' and "params" in elementmap:
+                for param_def in elementmap["params"]:
+                    paramelementmap = XMLElementMap(param_def)
+                    paramentry = entry.AddParams()
+                    
+                    for attribname, value in XMLStructValues(param_def, XMLFIELDS['PARAMS'], paramelementmap):
+                        setattr(paramentry, attribname, value)
+                    
+                    if "collisions" in paramelementmap:
+                        for collision_def in paramelementmap["collisions"]:
+                            paramentry.AddCollision( collision_def.text )
+
+# Writes a swing xml file with generated values for benchmarking
+def XMLWriteSynthetic(path, param_count=10000, params_per_bone=8):
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<struct>\n')
+        f.write('  <list size="%d" hash="swingbones">\n' % (param_count // params_per_bone))
+        for bi in range(param_count // params_per_bone):
+            f.write('    <struct index="%d">\n' % bi)
+            for hashname in ('name', 'start_bonename', 'end_bonename'):
+                f.write('      <hash40 hash="%s">s_bone%d</hash40>\n' % (hashname, bi))
+            f.write('      <list size="%d" hash="params">\n' % params_per_bone)
+            for pi in range(params_per_bone):
+                f.write('        <struct index="%d">\n' % pi)
+                for hashname, caster, required in XMLFIELDS['PARAMS']:
+                    f.write('          <%s hash="%s">%s</%s>\n' % (
+                        'sbyte' if caster == int else 'float', hashname, 1 if caster == int else 0.5, 
+                        'sbyte' if caster == int else 'float'))
+                f.write('          <list size="1" hash="collisions">\n')
+                f.write('            <hash40 index="0">bone%dcol</hash40>\n' % bi)
+                f.write('          </list>\n')
+                f.write('        </struct>\n')
+            f.write('      </list>\n')
+            f.write('      <sbyte hash="isskirt">0</sbyte>\n')
+            f.write('      <int hash="rotateorder">0</int>\n')
+            f.write('      <sbyte hash="curverotatex">0</sbyte>\n')
+            f.write('      <sbyte hash="0x0f7316a113">0</sbyte>\n')
+            f.write('    </struct>\n')
+        f.write('  </list>\n</struct>\n')
+
+# Times file parse, per-field findall() lookups and single pass element map lookups separately. Run from Blender's python console
+def BenchmarkXMLImport(param_count=10000):
+    import os
+    import tempfile
+    import time
+    
+    path = os.path.join(tempfile.gettempdir(), "swing_benchmark.xml")
+    XMLWriteSynthetic(path, param_count)
+    
+    # Parse
+    t = time.perf_counter()
+    root = ET.parse(path).getroot()
+    tparse = time.perf_counter() - t
+    
+    # findall() per field
+    t = time.perf_counter()
+    for el in root:
+        for struct_def in el.findall("struct"):
+            for hashname, caster, required in XMLFIELDS['BONE']:
+                XMLValueAny(struct_def, hashname)
+            for param_def in XMLElement(struct_def, "list", "params"):
+                for hashname, caster, required in XMLFIELDS['PARAMS']:
+                    XMLValue(param_def, 'sbyte' if caster == int else 'float', hashname)
+                [x.text for x in XMLElement(param_def, "list", "collisions")]
+    tfindall = time.perf_counter() - t
+    
+    # Element map
+    t = time.perf_counter()
+    for el in root:
+        for struct_def in el.findall("struct"):
+            elementmap = XMLElementMap(struct_def)
+            XMLStructValues(struct_def, XMLFIELDS['BONE'], elementmap)
+            for param_def in elementmap["params"]:
+                paramelementmap = XMLElementMap(param_def)
+                XMLStructValues(param_def, XMLFIELDS['PARAMS'], paramelementmap)
+                [x.text for x in paramelementmap["collisions"]]
+    tmap = time.perf_counter() - t
+    
+    os.remove(path)
+    print("> %d params: parse %.3fs, findall lookup %.3fs, element map lookup %.3fs" % (param_count, tparse, tfindall, tmap))
+    return (tparse, tfindall, tmap)
 
 "========================================================================================================="
 
@@ -500,6 +555,187 @@ def FlipSmashName(name):
         return name[:sidepos] + {k:v for k,v in zip("lrLR", "rlRL")}[sidechar] + name[sidepos+1:]
     return name
 
+"================================================================================================"
+"LABELS"
+"================================================================================================"
+
+LABELCACHEEXT = ".swinglabels"
+LABELCACHEMAGIC = b'SWLB'
+LABELCACHEVERSION = 2
+LABELLETTERS = frozenset("QWERTYUIOPASDFGHJKLZXCVBNMqwertyuiopasdfghjklzxcvbnm")
+
+# Hash set and prefix lookups for ParamLabels.csv. Lives outside of blend data
+class SwingLabelIndex():
+    def __init__(self):
+        self.Clear()
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    def __contains__(self, label):
+        return label == "" or label in self.labelset
+    
+    def Clear(self):
+        self.alllabels = ()     # Every label in csv, sorted
+        self.labels = ()        # Sorted labels that contain at least one letter
+        self.labelset = frozenset()
+        self.swingbones = ()    # "s_" labels
+        self.bonenames = ()     # Labels with a "s_" counterpart
+        self.collisions = ()    # "col" labels
+        self.csvpath = ""
+        self.csvmtime = 0.0
+        self.legacysource = None    # Label string the index was built from for blends without a csv path
+        self.matchers = {}      # Attribute name -> SwingLabelMatcher, built on first search
+    
+    def Build(self, labels, csvpath="", csvmtime=0.0):
+        labels = sorted(labels)
+        
+        self.alllabels = tuple(labels)
+        self.labels = tuple(x for x in labels if not LABELLETTERS.isdisjoint(x))
+        self.labelset = frozenset(self.labels)
+        self.swingbones = tuple(x for x in labels if x[:2] == 's_' and x[-3:] != 'col')
+        
+        swingset = frozenset(self.swingbones)
+        self.collisions = tuple(x for x in labels if x[-3:] == 'col')
+        self.bonenames = tuple(x for x in labels if x[-3:] != 'col' and x not in swingset and ('s_'+x) in swingset)
+        
+        self.csvpath = csvpath
+        self.csvmtime = csvmtime
+        self.legacysource = None
+        self.matchers = {}
+        return self
+    
+    # Returns matcher for closest label search over 'labels', 'swingbones', 'bonenames' or 'collisions'
+    def GetMatcher(self, attribname='labels'):
+        if attribname not in self.matchers:
+            self.matchers[attribname] = SwingLabelMatcher(getattr(self, attribname))
+        return self.matchers[attribname]
+    
+    # Reads label column of ParamLabels.csv
+    def ReadCSV(self, path):
+        with open(path, 'r') as csvfile:
+            csvreader = csv.reader(csvfile)
+            fields = next(csvreader)
+            labels = [r[1] for r in csvreader if len(r) > 1]
+        return self.Build(labels, path, os.path.getmtime(path))
+    
+    # Returns True if cache was read and matches csv on disk
+    def ReadCache(self, cachepath, csvpath):
+        if not os.path.isfile(cachepath):
+            return False
+        
+        with open(cachepath, 'rb') as f:
+            data = f.read()
+        
+        # Truncated or corrupt cache falls back to csv
+        try:
+            headersize = struct.calcsize('<4sIdI')
+            magic, version, csvmtime, pathsize = struct.unpack_from('<4sIdI', data)
+            if magic != LABELCACHEMAGIC or version != LABELCACHEVERSION:
+                return False
+            if len(data) < headersize + pathsize:
+                return False
+            
+            # Cache belongs to a different csv
+            if data[headersize:headersize+pathsize].decode('utf-8') != csvpath:
+                return False
+            
+            # Cache is stale when csv has changed. Missing csv keeps cache usable
+            if os.path.isfile(csvpath) and os.path.getmtime(csvpath) != csvmtime:
+                return False
+            
+            labels = zlib.decompress(data[headersize+pathsize:]).decode('utf-8').split("\n")
+        except (struct.error, zlib.error, UnicodeDecodeError):
+            return False
+        
+        self.Build([x for x in labels if x], csvpath, csvmtime)
+        return True
+    
+    # Writes to a temporary file first so an interrupted write never leaves a truncated cache
+    def WriteCache(self, cachepath):
+        temppath = cachepath + ".tmp"
+        with open(temppath, 'wb') as f:
+            csvpath = self.csvpath.encode('utf-8')
+            f.write(struct.pack('<4sIdI', LABELCACHEMAGIC, LABELCACHEVERSION, self.csvmtime, len(csvpath)))
+            f.write(csvpath)
+            f.write(zlib.compress("\n".join(self.alllabels).encode('utf-8')))
+        os.replace(temppath, cachepath)
+
+# Top-k closest label search. Labels are bucketed by length so that buckets whose length
+# difference alone exceeds the current k-th best distance are never visited
+class SwingLabelMatcher():
+    def __init__(self, labels):
+        self.buckets = {}   # length -> (labels, codepoint array)
+        
+        lengthmap = {}
+        for x in sorted(labels):
+            lengthmap.setdefault(len(x), []).append(x)
+        
+        for n, bucketlabels in lengthmap.items():
+            codes = np.frombuffer("".join(bucketlabels).encode('utf-32-le'), dtype=np.uint32)
+            self.buckets[n] = (tuple(bucketlabels), codes.astype(np.int32).reshape(len(bucketlabels), n))
+        
+        self.lengths = sorted(self.buckets.keys())
+    
+    def __len__(self):
+        return sum(len(x[0]) for x in self.buckets.values())
+    
+    # Returns up to count labels sorted by distance to label
+    def Find(self, label, count=8, exclude=()):
+        labeln = len(label)
+        query = np.array([ord(c) for c in label], dtype=np.int32)
+        candidates = []     # (distance, label)
+        threshold = None
+        
+        for n in sorted(self.lengths, key=lambda n: abs(n-labeln)):
+            lengthdistance = (n-labeln)*(n-labeln)
+            if threshold != None and lengthdistance > threshold:
+                break
+            
+            bucketlabels, codes = self.buckets[n]
+            m = min(n, labeln)
+            distances = np.abs(codes[:, :m] - query[:m]).sum(axis=1) + lengthdistance
+            
+            # Keep only entries that can still make the top k, including ties
+            limit = threshold
+            if len(distances) > count + len(exclude):
+                kth = np.partition(distances, count + len(exclude) - 1)[count + len(exclude) - 1]
+                limit = kth if limit == None else min(limit, kth)
+            
+            indices = np.nonzero(distances <= limit)[0] if limit != None else range(len(distances))
+            candidates += [(int(distances[i]), bucketlabels[i]) for i in indices if bucketlabels[i] not in exclude]
+            candidates.sort()
+            del candidates[count:]
+            
+            if len(candidates) == count:
+                threshold = candidates[-1][0]
+        
+        return [x[1] for x in candidates]
+    
+    # Returns list of results for each label. Unique keeps a result from being given to two labels
+    def FindBatch(self, labels, count=8, exclude=(), unique=False):
+        exclude = set(exclude)
+        out = []
+        for label in labels:
+            result = self.Find(label, count, exclude)
+            if unique and result:
+                exclude.add(result[0])
+            out.append(result)
+        return out
+
+SWINGLABELS = SwingLabelIndex()
+
+# Returns path of label cache for current blend file. Empty if file is unsaved
+def SwingLabelCachePath():
+    if not bpy.data.filepath:
+        return ""
+    return os.path.splitext(bpy.data.filepath)[0] + LABELCACHEEXT
+
+# Index belongs to the previous file once a new one is loaded
+@bpy.app.handlers.persistent
+def SwingLabelsLoadPost(*args):
+    SWINGLABELS.Clear()
+
 "================================================================================================"
 "SWING DATA CLASSES"
 "================================================================================================"
@@ -512,8 +748,8 @@ classlist.append(SwingData_Label)
 class SwingData_Hash40(bpy.types.PropertyGroup): # ---------------------------------
     hash40 : bpy.props.StringProperty()
     
-    def Serialize(self, tabs=0, index=0):
-        return SerializeValue('hash40', "index", index, self.hash40, tabs)
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeValue(file, 'hash40', "index", index, self.hash40, tabs)
 classlist.append(SwingData_Hash40)
 
 class SwingData_Hash40List(bpy.types.PropertyGroup): # ---------------------------------------
@@ -542,8 +778,8 @@ class SwingData_Hash40List(bpy.types.PropertyGroup): # -------------------------
         for entry in other:
             self.Add(entry.hash40)
     
-    def Serialize(self, tabs=0, index=0):
-        return SerializeList(self.name, self.data, tabs)
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeList(file, self.name, self.data, tabs)
 classlist.append(SwingData_Hash40List)
 
 "------------------------------------------------------------------------------------------------"
@@ -684,25 +920,23 @@ class SwingData_Swing_Bone_Params(bpy.types.PropertyGroup): # ------------------
             for c in other.collisions:
                 self.AddCollision(c.hash40)
     
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        out += SerializeFloat("airresistance", self.airresistance, tabs)
-        out += SerializeFloat("waterresistance", self.waterresistance, tabs)
-        out += SerializeFloat("minanglez", self.minanglez, tabs)
-        out += SerializeFloat("maxanglez", self.maxanglez, tabs)
-        out += SerializeFloat("minangley", self.minangley, tabs)
-        out += SerializeFloat("maxangley", self.maxangley, tabs)
-        out += SerializeFloat("collisionsizetip", self.collisionsizetip, tabs)
-        out += SerializeFloat("collisionsizeroot", self.collisionsizeroot, tabs)
-        out += SerializeFloat("frictionrate", self.frictionrate, tabs)
-        out += SerializeFloat("goalstrength", self.goalstrength, tabs)
-        out += SerializeFloat("0x0cc10e5d3a", self.unknown_0x0cc10e5d3a, tabs)
-        out += SerializeFloat("localgravity", self.localgravity, tabs)
-        out += SerializeFloat("fallspeedscale", self.fallspeedscale, tabs)
-        out += SerializeSbyte("groundhit", self.groundhit, tabs)
-        out += SerializeFloat("windaffect", self.windaffect, tabs)
-        out += SerializeList("collisions", self.collisions, tabs)
-        return out
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeFloat(file, "airresistance", self.airresistance, tabs)
+        SerializeFloat(file, "waterresistance", self.waterresistance, tabs)
+        SerializeFloat(file, "minanglez", self.minanglez, tabs)
+        SerializeFloat(file, "maxanglez", self.maxanglez, tabs)
+        SerializeFloat(file, "minangley", self.minangley, tabs)
+        SerializeFloat(file, "maxangley", self.maxangley, tabs)
+        SerializeFloat(file, "collisionsizetip", self.collisionsizetip, tabs)
+        SerializeFloat(file, "collisionsizeroot", self.collisionsizeroot, tabs)
+        SerializeFloat(file, "frictionrate", self.frictionrate, tabs)
+        SerializeFloat(file, "goalstrength", self.goalstrength, tabs)
+        SerializeFloat(file, "0x0cc10e5d3a", self.unknown_0x0cc10e5d3a, tabs)
+        SerializeFloat(file, "localgravity", self.localgravity, tabs)
+        SerializeFloat(file, "fallspeedscale", self.fallspeedscale, tabs)
+        SerializeSbyte(file, "groundhit", self.groundhit, tabs)
+        SerializeFloat(file, "windaffect", self.windaffect, tabs)
+        SerializeList(file, "collisions", self.collisions, tabs)
 
     def DrawPanel(self, layout, draw_collisions=True):
         c = layout.column(align=True)
@@ -837,17 +1071,15 @@ class SwingData_Swing_Bone(bpy.types.PropertyGroup): # -------------------------
         
         return self
     
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        out += SerializeString("name", self.name, tabs)
-        out += SerializeString("start_bonename", self.start_bonename, tabs)
-        out += SerializeString("end_bonename", self.end_bonename, tabs)
-        out += SerializeListOfStructs("params", self.params, tabs)
-        out += SerializeSbyte("isskirt", self.isskirt, tabs)
-        out += SerializeInt("rotateorder", self.rotateorder, tabs)
-        out += SerializeSbyte("curverotatex", self.curverotatex, tabs)
-        out += SerializeSbyte("0x0f7316a113", self.unknown_0x0f7316a113, tabs)
-        return out
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeString(file, "name", self.name, tabs)
+        SerializeString(file, "start_bonename", self.start_bonename, tabs)
+        SerializeString(file, "end_bonename", self.end_bonename, tabs)
+        SerializeListOfStructs(file, "params", self.params, tabs)
+        SerializeSbyte(file, "isskirt", self.isskirt, tabs)
+        SerializeInt(file, "rotateorder", self.rotateorder, tabs)
+        SerializeSbyte(file, "curverotatex", self.curverotatex, tabs)
+        SerializeSbyte(file, "0x0f7316a113", self.unknown_0x0f7316a113, tabs)
 
     def DrawPanel(self, layout):
         b = layout.box().column(align=True)
@@ -930,15 +1162,13 @@ class SwingData_Swing_CollisionSphere(bpy.types.PropertyGroup): # --------------
         self.cz = other.cz
         self.radius = other.radius
     
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        out += SerializeString("name", self.name, tabs)
-        out += SerializeString("bonename", self.bonename, tabs)
-        out += SerializeFloat("cx", self.cx, tabs)
-        out += SerializeFloat("cy", self.cy, tabs)
-        out += SerializeFloat("cz", self.cz, tabs)
-        out += SerializeFloat("radius", self.radius, tabs)
-        return out
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeString(file, "name", self.name, tabs)
+        SerializeString(file, "bonename", self.bonename, tabs)
+        SerializeFloat(file, "cx", self.cx, tabs)
+        SerializeFloat(file, "cy", self.cy, tabs)
+        SerializeFloat(file, "cz", self.cz, tabs)
+        SerializeFloat(file, "radius", self.radius, tabs)
 
     def DrawPanel(self, layout):
         b = layout.box().column(align=False)
@@ -981,15 +1211,13 @@ class SwingData_Swing_CollisionOval(bpy.types.PropertyGroup): # ----------------
         self.cz = other.cz
         self.radius = other.radius
     
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        out += SerializeString("name", self.name, tabs)
-        out += SerializeString("bonename", self.bonename, tabs)
-        out += SerializeFloat("cx", self.cx, tabs)
-        out += SerializeFloat("cy", self.cy, tabs)
-        out += SerializeFloat("cz", self.cz, tabs)
-        out += SerializeFloat("radius", self.radius, tabs)
-        return out
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeString(file, "name", self.name, tabs)
+        SerializeString(file, "bonename", self.bonename, tabs)
+        SerializeFloat(file, "cx", self.cx, tabs)
+        SerializeFloat(file, "cy", self.cy, tabs)
+        SerializeFloat(file, "cz", self.cz, tabs)
+        SerializeFloat(file, "radius", self.radius, tabs)
 classlist.append(SwingData_Swing_CollisionOval)
 
 class SwingData_Swing_CollisionEllipsoid(bpy.types.PropertyGroup): # ---------------------------------
@@ -1068,20 +1296,18 @@ class SwingData_Swing_CollisionEllipsoid(bpy.types.PropertyGroup): # -----------
         self.sy = other.sy
         self.sz = other.sz
     
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        out += SerializeString("name", self.name, tabs)
-        out += SerializeString("bonename", self.bonename, tabs)
-        out += SerializeFloat("cx", self.cx, tabs)
-        out += SerializeFloat("cy", self.cy, tabs)
-        out += SerializeFloat("cz", self.cz, tabs)
-        out += SerializeFloat("rx", self.rx, tabs)
-        out += SerializeFloat("ry", self.ry, tabs)
-        out += SerializeFloat("rz", self.rz, tabs)
-        out += SerializeFloat("sx", self.sx, tabs)
-        out += SerializeFloat("sy", self.sy, tabs)
-        out += SerializeFloat("sz", self.sz, tabs)
-        return out
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeString(file, "name", self.name, tabs)
+        SerializeString(file, "bonename", self.bonename, tabs)
+        SerializeFloat(file, "cx", self.cx, tabs)
+        SerializeFloat(file, "cy", self.cy, tabs)
+        SerializeFloat(file, "cz", self.cz, tabs)
+        SerializeFloat(file, "rx", self.rx, tabs)
+        SerializeFloat(file, "ry", self.ry, tabs)
+        SerializeFloat(file, "rz", self.rz, tabs)
+        SerializeFloat(file, "sx", self.sx, tabs)
+        SerializeFloat(file, "sy", self.sy, tabs)
+        SerializeFloat(file, "sz", self.sz, tabs)
 
     def DrawPanel(self, layout):
         b = layout.box().column(align=False)
@@ -1221,20 +1447,18 @@ class SwingData_Swing_CollisionCapsule(bpy.types.PropertyGroup): # -------------
         self.start_radius = other.start_radius
         self.end_radius = other.end_radius
     
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        out += SerializeString("name", self.name, tabs)
-        out += SerializeString("start_bonename", self.start_bonename, tabs)
-        out += SerializeString("end_bonename", self.end_bonename, tabs)
-        out += SerializeFloat("start_offset_x", self.start_offset_x, tabs)
-        out += SerializeFloat("start_offset_y", self.start_offset_y, tabs)
-        out += SerializeFloat("start_offset_z", self.start_offset_z, tabs)
-        out += SerializeFloat("end_offset_x", self.end_offset_x, tabs)
-        out += SerializeFloat("end_offset_y", self.end_offset_y, tabs)
-        out += SerializeFloat("end_offset_z", self.end_offset_z, tabs)
-        out += SerializeFloat("start_radius", self.start_radius, tabs)
-        out += SerializeFloat("end_radius", self.end_radius, tabs)
-        return out
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeString(file, "name", self.name, tabs)
+        SerializeString(file, "start_bonename", self.start_bonename, tabs)
+        SerializeString(file, "end_bonename", self.end_bonename, tabs)
+        SerializeFloat(file, "start_offset_x", self.start_offset_x, tabs)
+        SerializeFloat(file, "start_offset_y", self.start_offset_y, tabs)
+        SerializeFloat(file, "start_offset_z", self.start_offset_z, tabs)
+        SerializeFloat(file, "end_offset_x", self.end_offset_x, tabs)
+        SerializeFloat(file, "end_offset_y", self.end_offset_y, tabs)
+        SerializeFloat(file, "end_offset_z", self.end_offset_z, tabs)
+        SerializeFloat(file, "start_radius", self.start_radius, tabs)
+        SerializeFloat(file, "end_radius", self.end_radius, tabs)
 
     def DrawPanel(self, layout):
         b = layout.box().column(align=False)
@@ -1321,15 +1545,13 @@ class SwingData_Swing_CollisionPlane(bpy.types.PropertyGroup): # ---------------
         self.nz = other.nz
         self.distance = other.distance
     
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        out += SerializeString("name", self.name, tabs)
-        out += SerializeString("bonename", self.bonename, tabs)
-        out += SerializeFloat("nx", self.nx, tabs)
-        out += SerializeFloat("ny", self.ny, tabs)
-        out += SerializeFloat("nz", self.nz, tabs)
-        out += SerializeFloat("distance", self.distance, tabs)
-        return out
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeString(file, "name", self.name, tabs)
+        SerializeString(file, "bonename", self.bonename, tabs)
+        SerializeFloat(file, "nx", self.nx, tabs)
+        SerializeFloat(file, "ny", self.ny, tabs)
+        SerializeFloat(file, "nz", self.nz, tabs)
+        SerializeFloat(file, "distance", self.distance, tabs)
 
     def DrawPanel(self, layout):
         b = layout.box().column(align=False)
@@ -1366,13 +1588,11 @@ class SwingData_Swing_Connection(bpy.types.PropertyGroup): # -------------------
         self.radius = other.radius
         self.length = other.length
     
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        out += SerializeString("start_bonename", self.start_bonename, tabs)
-        out += SerializeString("end_bonename", self.end_bonename, tabs)
-        out += SerializeFloat("radius", self.radius, tabs)
-        out += SerializeFloat("length", self.length, tabs)
-        return out
+    def Serialize(self, file, tabs=0, index=0):
+        SerializeString(file, "start_bonename", self.start_bonename, tabs)
+        SerializeString(file, "end_bonename", self.end_bonename, tabs)
+        SerializeFloat(file, "radius", self.radius, tabs)
+        SerializeFloat(file, "length", self.length, tabs)
 
     def DrawPanel(self, layout):
         b = layout.box().column(align=True)
@@ -1680,40 +1900,35 @@ class SwingData(bpy.types.PropertyGroup):
     def FromXML(self, xmlpath):
         XMLToSwingEdit(self, bpy.context, xmlpath)
     
-    # Returns XML string of swing data
-    def Serialize(self, tabs=0, index=0):
-        out = ""
-        
-        #out += "ï»¿"
-        out += '<?xml version="1.0" encoding="utf-8"?>\n'
-        out += '<struct>\n'
+    # Writes swing data as XML to open text file
+    def Serialize(self, file, tabs=0, index=0):
+        #file.write("ï»¿")
+        file.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        file.write('<struct>\n')
         
         tabs += 1
-        out += SerializeListOfStructs("swingbones", self.swingbones, tabs)
-        out += SerializeListOfStructs("spheres", self.spheres, tabs)
-        out += SerializeListOfStructs("ovals", self.ovals, tabs)
-        out += SerializeListOfStructs("ellipsoids", self.ellipsoids, tabs)
-        out += SerializeListOfStructs("capsules", self.capsules, tabs)
-        out += SerializeListOfStructs("planes", self.planes, tabs)
-        out += SerializeListOfStructs("connections", self.connections, tabs)
+        SerializeListOfStructs(file, "swingbones", self.swingbones, tabs)
+        SerializeListOfStructs(file, "spheres", self.spheres, tabs)
+        SerializeListOfStructs(file, "ovals", self.ovals, tabs)
+        SerializeListOfStructs(file, "ellipsoids", self.ellipsoids, tabs)
+        SerializeListOfStructs(file, "capsules", self.capsules, tabs)
+        SerializeListOfStructs(file, "planes", self.planes, tabs)
+        SerializeListOfStructs(file, "connections", self.connections, tabs)
         
         for i, group in enumerate(self.groups):
-            out += group.Serialize(tabs)
+            group.Serialize(file, tabs)
         tabs -= 1
         
-        out += '</struct>\n'
-        
-        return out
+        file.write('</struct>\n')
     
     # Checks all hashes against labels
     def Validate(self):
-        labels = bpy.context.scene.swing_ultimate.prc_labels_string.split()
+        labels = bpy.context.scene.swing_ultimate.GetLabelIndex()
         
         if len(labels) == 0:
             print("> No labels loaded. Use the \"Update Labels\" button to read ParamLabels.csv")
             return None
         
-        labels += [""]
         conflicts = []
         
         def CheckMemberVariable(type, id, varname, index=-1, varname2="", index2=-1, varname3=""):
@@ -1925,8 +2140,12 @@ class SwingData(bpy.types.PropertyGroup):
                     if c.hash40:
                         group.Add(c.hash40)
         
-        for groupname, p in invalidgroups:
-            groupname = swing_ultimate.GetActiveData().FindClosestGroupLabel(groupname)[0]
+        closestlabels = self.FindClosestGroupLabels([x[0] for x in invalidgroups], 1, unique=True)
+        
+        for (groupname, p), closest in zip(invalidgroups, closestlabels):
+            if not closest:
+                continue
+            groupname = closest[0]
             print("> Group \"%s\"" % groupname)
             group = self.AddStruct('GROUP')
             group.name = groupname
@@ -1937,15 +2156,19 @@ class SwingData(bpy.types.PropertyGroup):
     
     # Returns label lose enough to given string
     def FindClosestGroupLabel(self, label, print_count=8):
-        usedlabels = [g.name for g in self.groups]
-        targetlabels = [x.name for x in bpy.context.scene.swing_ultimate.prc_labels_collisions if x.name not in usedlabels]
+        return self.FindClosestGroupLabels([label], print_count)[0]
+    
+    # Returns closest labels for each given string. Unique gives each string a different first label
+    def FindClosestGroupLabels(self, labels, print_count=8, unique=False):
+        swing_ultimate = bpy.context.scene.swing_ultimate
+        labelindex = swing_ultimate.GetLabelIndex()
         
-        Sqr = lambda x: x*x
-        Abs = lambda x: x if x >= 0 else -x
-        labeln = len(label)
+        if len(labelindex.collisions) > 0:
+            matcher = labelindex.GetMatcher('collisions')
+        else:
+            matcher = SwingLabelMatcher([x.name for x in swing_ultimate.prc_labels_collisions])
         
-        targetlabels.sort(key=lambda x: sum([ Abs(ord(c1)-ord(c2)) for c1,c2 in zip(label, x)] ) + Sqr(len(x)-labeln) )
-        return targetlabels[:print_count]
+        return matcher.FindBatch(labels, print_count, [g.name for g in self.groups], unique)
 
 classlist.append(SwingData)
 
@@ -1975,7 +2198,7 @@ class SwingSceneData(bpy.types.PropertyGroup):
     index : bpy.props.EnumProperty(name="Active Swing Data", default=0, items=SwingSceneNames)
     count : bpy.props.IntProperty()
     
-    prc_labels_string : bpy.props.StringProperty(default="")
+    prc_labels_path : bpy.props.StringProperty(default="")
     prc_labels_roots : bpy.props.StringProperty(default="")
     
     prc_labels_bonename : bpy.props.CollectionProperty(type=SwingData_Label)
@@ -2037,59 +2260,65 @@ class SwingSceneData(bpy.types.PropertyGroup):
     # Updates labels from CSV file
     def UpdateLabels(self, path):
         print("> Parsing Labels...")
-        with open(path, 'r') as csvfile:
-            csvreader = csv.reader(csvfile)
-            fields = next(csvreader)
-            
-            labels = [r for r in csvreader]
-            labels.sort(key=lambda x: x[1])
-            
-            self.prc_labels_string = "".join(
-                r[1] + " "
-                for r in labels if sum([1 for x in r[1] if x.upper() in "QWERTYUIOPASDFGHJKLZXCVBNM"])
-            )
-            
-            self.prc_labels_bonename.clear()
-            self.prc_labels_swingbone.clear()
-            self.prc_labels_collisions.clear()
-            
-            # Generate String Lists ---------------------------------
-            nextlabels = []
-            swingnames = []
-            
-            # Swing
-            for hex, label in labels:
-                if label[:2] == 's_' and label[-3:] != 'col':
-                    self.prc_labels_swingbone.add().name = label
-                    swingnames.append(label)
-                else:
-                    nextlabels.append(label)
-            
-            # Bone
-            for label in nextlabels:
-                if label[-3:] == 'col':
-                    self.prc_labels_collisions.add().name = label
-                elif sum([1 for x in swingnames if 's_'+(label) == x]):
-                    self.prc_labels_bonename.add().name = label
-                
         
-        print("> Labels updated. Count = %d" % len(labels))
+        cachepath = SwingLabelCachePath()
+        if not (cachepath and SWINGLABELS.ReadCache(cachepath, path)):
+            SWINGLABELS.ReadCSV(path)
+            if cachepath:
+                SWINGLABELS.WriteCache(cachepath)
+        
+        self.prc_labels_path = path
+        
+        self.prc_labels_bonename.clear()
+        self.prc_labels_swingbone.clear()
+        self.prc_labels_collisions.clear()
+        
+        # Generate String Lists ---------------------------------
+        for label in SWINGLABELS.swingbones:
+            self.prc_labels_swingbone.add().name = label
+        for label in SWINGLABELS.collisions:
+            self.prc_labels_collisions.add().name = label
+        for label in SWINGLABELS.bonenames:
+            self.prc_labels_bonename.add().name = label
+        
+        print("> Labels updated. Count = %d" % len(SWINGLABELS.alllabels))
         print("> %d Swing Names" % len(self.prc_labels_bonename))
         print("> %d Swing Bones" % len(self.prc_labels_swingbone))
         print("> %d Swing Collisions" % len(self.prc_labels_collisions))
         
         return True
     
+    # Returns label index, loading it from cache or CSV when blend file was reopened or the CSV path changed.
+    # Blends saved before prc_labels_path existed keep their labels in the legacy "prc_labels_string" property
+    def GetLabelIndex(self):
+        path = self.prc_labels_path
+        legacy = None if path else self.get('prc_labels_string')
+        
+        if SWINGLABELS.csvpath != path or SWINGLABELS.legacysource != legacy or len(SWINGLABELS) == 0:
+            SWINGLABELS.Clear()
+            
+            if path:
+                cachepath = SwingLabelCachePath()
+                if not (cachepath and SWINGLABELS.ReadCache(cachepath, path)):
+                    if os.path.isfile(path):
+                        SWINGLABELS.ReadCSV(path)
+                        if cachepath:
+                            SWINGLABELS.WriteCache(cachepath)
+            elif legacy:
+                SWINGLABELS.Build(legacy.split())
+                SWINGLABELS.legacysource = legacy
+        return SWINGLABELS
+    
+    # Removes stored labels
+    def ClearLabels(self):
+        SWINGLABELS.Clear()
+        self.prc_labels_path = ""
+        if 'prc_labels_string' in self:
+            del self['prc_labels_string']
+    
     # Returns label matching or close enough to given string
     def FindClosestLabel(self, label, print_count=8):
-        targetlabels = self.prc_labels_string.split()
-        
-        Sqr = lambda x: x*x
-        Abs = lambda x: x if x >= 0 else -x
-        labeln = len(label)
-        
-        targetlabels.sort(key=lambda x: sum([ Abs(ord(c1)-ord(c2)) for c1,c2 in zip(label, x)] ) + Sqr(len(x)-labeln) )
-        return targetlabels[:print_count]
+        return self.GetLabelIndex().GetMatcher('labels').Find(label, print_count)
     
     # Refreshes drivers for visuals
     def UpdateVisuals(self):
@@ -2133,7 +2362,7 @@ class SWINGULT_OP_RemoveLabels(bpy.types.Operator):
     bl_label = "Clear Labels"
     
     def execute(self, context):
-        context.scene.swing_ultimate.prc_labels_string = ""
+        context.scene.swing_ultimate.ClearLabels()
         return {'FINISHED'}
 classlist.append(SWINGULT_OP_RemoveLabels)
 
@@ -2189,10 +2418,8 @@ class SWINGULT_OP_SwingData_ToXML(bpy.types.Operator, ExportHelper):
     filter_glob: bpy.props.StringProperty(default="*.xml", options={'HIDDEN'}, maxlen=255)
     
     def execute(self, context):
-        out = context.scene.swing_ultimate.GetActiveData().Serialize()
-        file = open(self.filepath, "w")
-        file.write(out)
-        file.close()
+        with open(self.filepath, "w", buffering=XMLWRITEBUFFERSIZE) as file:
+            context.scene.swing_ultimate.GetActiveData().Serialize(file)
         return {'FINISHED'}
 classlist.append(SWINGULT_OP_SwingData_ToXML)
 
@@ -3523,8 +3750,14 @@ def register():
     
     bpy.types.Scene.swing_ultimate = bpy.props.PointerProperty(name="Swing Data", type=SwingSceneData)
     bpy.types.PoseBone.swing_ultimate_show_visuals = bpy.props.BoolProperty(name="Show Visuals", default=True)
+    
+    bpy.app.handlers.load_post.append(SwingLabelsLoadPost)
 
 def unregister():
+    if SwingLabelsLoadPost in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(SwingLabelsLoadPost)
+    SWINGLABELS.Clear()
+    
     for c in classlist[::-1]:
         bpy.utils.unregister_class(c)
 
@@ -14,6 +14,8 @@ import bpy
 #from . import utilities, dmr_hotmenu, dmr_misc_op, dmr_pose_op, dmr_sculpt_op, dmr_shapekey_op, dmr_vcolor_op, dmr_vertex_op, dmr_vgroup_op, dmr_pose_panel, dmr_shapekey_panel, dmr_vcolor_panel, dmr_vgroup_panel
 
 modulesNames = [
+    'dmr_weights',
+    
     'dmr_hotmenu',
     
     'dmr_op_object',
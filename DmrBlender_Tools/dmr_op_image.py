@@ -1,5 +1,7 @@
 import bpy
 import bmesh
+import time
+import numpy as np
 
 classlist = []
 
@@ -26,6 +28,101 @@ def ChannelSelect(self, i):
 
 # =============================================================================
 
+# Returns image pixels as (pixel count, channels) float32 array
+def ImageToArray(image):
+    pixels = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels.reshape(-1, image.channels)
+
+def ArrayToImage(image, pixels):
+    image.pixels.foreach_set(np.ascontiguousarray(pixels, dtype=np.float32).ravel())
+    image.update()
+
+# Writes channel readchannels[i] of srcimages[i] to channel i of image
+# Sources are read once each and before anything is written
+def ComposeChannels(image, srcimages, readchannels):
+    srcdata = {image.name: ImageToArray(image)}
+    out = srcdata[image.name].copy()
+    
+    for i in range(min(4, image.channels)):
+        src = srcimages[i]
+        if src == image and readchannels[i] == i:
+            continue
+        
+        if src.name not in srcdata:
+            srcdata[src.name] = ImageToArray(src)
+        data = srcdata[src.name]
+        
+        if len(data) != len(out):
+            raise ValueError('Image "%s" size %s does not match "%s" size %s' % (src.name, tuple(src.size), image.name, tuple(image.size)))
+        out[:, i] = data[:, min(readchannels[i], src.channels-1)]
+    
+    ArrayToImage(image, out)
+
+# Rescales image values to 0-1 range in place. Values at or below threshold are ignored when finding range
+# Returns list of (min, max) used, with None for channels that had no usable values
+def NormalizeImage(image, per_channel=False, clip_percent=0.0, threshold=0.004):
+    pixels = ImageToArray(image)
+    
+    # Range of red channel is applied to all channels, or each color channel gets its own range
+    readchannels = range(min(3, image.channels)) if per_channel else (0,)
+    ranges = []
+    
+    for c in readchannels:
+        values = pixels[:, c]
+        values = values[values > threshold]
+        
+        if len(values) == 0:
+            ranges.append(None)
+        elif clip_percent > 0.0:
+            ranges.append(tuple(np.percentile(values, (clip_percent, 100.0-clip_percent))))
+        else:
+            ranges.append((values.min(), values.max()))
+    
+    ranges = [(float(x[0]), float(x[1])) if (x and x[1] > x[0]) else None for x in ranges]
+    targets = [pixels[:, c] for c in readchannels] if per_channel else [pixels]
+    
+    for target, valuerange in zip(targets, ranges):
+        if valuerange:
+            target -= valuerange[0]
+            target *= 1.0/(valuerange[1]-valuerange[0])
+            if clip_percent > 0.0:
+                np.clip(target, 0.0, 1.0, out=target)
+    
+    ArrayToImage(image, pixels)
+    return ranges
+
+# Times per-float tuple composition against ComposeChannels. Can run headless with "blender -b --python-expr"
+def BenchmarkComposeImageValues(sizes=(1024, 2048, 4096), legacy=True):
+    results = []
+    for size in sizes:
+        images = [bpy.data.images.new("benchmark_compose_%d" % i, size, size, alpha=True, float_buffer=True) for i in range(5)]
+        image, srcimages = images[0], images[1:]
+        readchannel = (3, 2, 1, 0)
+        
+        tlegacy = 0.0
+        if legacy:
+            t = time.perf_counter()
+            sourcedata = tuple([tuple(srcimages[i].pixels) for i in range(0, 4)])
+            image.pixels = tuple(
+                sourcedata[ pi%4 ][ 4*(pi//4)+readchannel[pi%4] ]
+                for pi in range(0, size*size*4)
+            )
+            tlegacy = time.perf_counter() - t
+        
+        t = time.perf_counter()
+        ComposeChannels(image, srcimages, readchannel)
+        tarray = time.perf_counter() - t
+        
+        for img in images:
+            bpy.data.images.remove(img)
+        
+        print("> %dx%d: tuple %.3fs, array %.3fs" % (size, size, tlegacy, tarray))
+        results.append((size, tlegacy, tarray))
+    return results
+
+# =============================================================================
+
 class DMR_OT_ComposeImageValues(bpy.types.Operator):
     """Compose a value map image from existing images"""
     bl_idname = "dmr.compose_value_map_image"
@@ -95,7 +192,7 @@ class DMR_OT_ComposeImageValues(bpy.types.Operator):
         range4 = range(0, 4)
         
         if self.image not in blender_images.keys():
-            self.report({'ERROR', 'No image found with name "%s"' % self.image.name})
+            self.report({'ERROR'}, 'No image found with name "%s"' % self.image)
             return {'FINISHED'}
         
         image = blender_images[self.image]
@@ -113,24 +210,17 @@ class DMR_OT_ComposeImageValues(bpy.types.Operator):
         # List of channels indices[4]
         readchannel = tuple([{'R':0, 'G':1, 'B':2, 'A':3}[getattr(self, 'read%d'%i)] if channels[i] else i for i in range4])
         
-        pixels = image.pixels
-        w, h = image.size
-        n = w*h
-        n4 = n*4
-        
         print("channels: ", self.channels)
         print("read: ", readchannel)
         print("src_images: ", [x.name if x else "<None>" for x in src_images])
         
-        sourcedata = tuple([tuple(src_images[i].pixels) for i in range4])
-        
         print('> Writing...')
         
-        # pixels = image[ writeindex ][ readindex ]
-        image.pixels = tuple(
-            sourcedata[ pi%4 ][ 4*(pi//4)+readchannel[pi%4] ]
-            for pi in range(0, n4)
-        )
+        try:
+            ComposeChannels(image, src_images, readchannel)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'FINISHED'}
         
         self.report({'INFO'}, "Composition Complete")
         
@@ -212,27 +302,25 @@ class DMR_OT_NormalizeBWImage(bpy.types.Operator):
     image : bpy.props.EnumProperty(name='Destination', default=0, items=Items_Images,
         description='Image to write to')
     
+    per_channel : bpy.props.BoolProperty(name='Per Channel', default=False,
+        description='Normalize R, G and B separately. Otherwise the red channel range is applied to all channels')
+    
+    clip_percent : bpy.props.FloatProperty(name='Clip Percentile', default=0.0, min=0.0, max=49.0, subtype='PERCENTAGE',
+        description='Ignore this percent of the darkest and brightest values when finding range. Results are clamped to 0-1')
+    
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self, width=240)
     
     def execute(self, context):
         if self.image not in bpy.data.images.keys():
-            self.report({'ERROR', 'No image found with name "%s"' % self.image.name})
+            self.report({'ERROR'}, 'No image found with name "%s"' % self.image)
             return {'FINISHED'}
         
         image = bpy.data.images[self.image]
-        pixels = tuple(image.pixels)
-        values = tuple(pixels[i] for i in range(0, len(pixels), 4) if pixels[i] > 0.004)
-        minvalue = min(values)
-        maxvalue = max(values)
-        multiplier = 1/(maxvalue-minvalue)
-        
-        image.pixels = tuple(
-            ( (pixels[i]-minvalue)*multiplier )
-            for i in range(0, len(pixels))
-        )
+        ranges = NormalizeImage(image, self.per_channel, self.clip_percent)
         
-        image.update()
+        if None in ranges:
+            self.report({'WARNING'}, "Some channels have no value range to normalize")
         
         return {'FINISHED'}
 classlist.append(DMR_OT_NormalizeBWImage)
@@ -1,5 +1,13 @@
 import bpy
 import bmesh
+import mathutils.kdtree
+import numpy as np
+import concurrent.futures
+import importlib
+import time
+
+# Shared weight table module. Loaded before operator modules by __init__
+dmr_weights = importlib.import_module(__name__.rpartition('.')[0] + '.dmr_weights' if '.' in __name__ else 'dmr_weights')
 
 classlist = []
 
@@ -449,6 +457,39 @@ classlist.append(DMR_OP_NewObjectProperty)
 
 # =============================================================================
 
+# Returns (n, 3) local coordinates, (n, 3) world coordinates and selection mask of object's vertices
+def ReadVertexCoords(obj):
+    mesh = obj.data
+    co = np.empty(len(mesh.vertices)*3, dtype=np.float32)
+    select = np.empty(len(mesh.vertices), dtype=bool)
+    mesh.vertices.foreach_get('co', co)
+    mesh.vertices.foreach_get('select', select)
+    
+    co = co.reshape(-1, 3)
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    return (co, co @ matrix[:3, :3].T + matrix[:3, 3], select)
+
+# Returns index of nearest tree point per point. -1 if none within distance
+def FindNearestWithin(kd, points, distance):
+    result = np.full(len(points), -1, dtype=np.int32)
+    for i, co in enumerate(points.tolist()):
+        hitco, index, dist = kd.find(co)
+        if index is not None and dist <= distance:
+            result[i] = index
+    return result
+
+# Returns (snapped points, hit mask) for points snapped to nearest anchor within distance
+def SnapPoints(kd, anchors, points, distance, snap='ACTIVE'):
+    nearest = FindNearestWithin(kd, points, distance)
+    hit = nearest >= 0
+    
+    result = points.copy()
+    if snap == 'ACTIVE':
+        result[hit] = anchors[nearest[hit]]
+    else:
+        result[hit] = (points[hit] + anchors[nearest[hit]]) / 2
+    return (result, hit)
+
 class DMR_OP_SnapVerticesOfMultipleObjects(bpy.types.Operator):
     bl_label = "Snap Vertices to Active Object"
     bl_idname = 'dmr.snap_vertices_to_active'
@@ -463,6 +504,8 @@ class DMR_OP_SnapVerticesOfMultipleObjects(bpy.types.Operator):
         ('CENTER', "Center", "Snap to middle distance between matching vertices"),
     ))
     
+    threads : bpy.props.IntProperty(name="Threads", default=1, min=0, description="Number of threads used to snap objects. 0 = Automatic")
+    
     @classmethod
     def poll(self, context):
         return context.object and context.object.type == 'MESH' and context.object.mode == 'EDIT'
@@ -472,55 +515,45 @@ class DMR_OP_SnapVerticesOfMultipleObjects(bpy.types.Operator):
         
         active = context.active_object
         
-        targetobjects = [x for x in context.selected_objects if x.type == 'MESH']
+        targetobjects = [x for x in context.selected_objects if x.type == 'MESH' and x != active]
         
-        vertmap = {
-            obj: tuple([v for v in obj.data.vertices if (v.select or not self.selected_only)])
-            for obj in targetobjects
-        }
+        # Tree of active vertices in world space
+        _, anchors, activeselect = ReadVertexCoords(active)
+        if self.selected_only:
+            anchors = anchors[activeselect]
         
-        activeverts = vertmap[active]
-        merge_distance = self.merge_distance
-        hits = 0
+        kd = mathutils.kdtree.KDTree(len(anchors))
+        for i, co in enumerate(anchors.tolist()):
+            kd.insert(co, i)
+        kd.balance()
         
-        # Snap to active
-        if self.snap == 'ACTIVE':
-            for obj in targetobjects:
-                if obj == active:
-                    continue
-                verts = vertmap[obj]
-                
-                for v1 in verts:
-                    d = merge_distance
-                    outvert = v1
-                    for v2 in activeverts:
-                        if (v2.co-v1.co).length <= d:
-                            d = (v2.co-v1.co).length
-                            outvert = v2
-                    if v1 != outvert:
-                        v1.co = outvert.co
-                        hits += 1
-        
-        # Snap to mid distance
-        if self.snap == 'CENTER':
-            for obj in targetobjects:
-                if obj == active:
-                    continue
-                verts = vertmap[obj]
-                
-                for v1 in verts:
-                    d = merge_distance
-                    outvert = v1
-                    for v2 in activeverts:
-                        if (v2.co-v1.co).length <= d:
-                            d = (v2.co-v1.co).length
-                            outvert = v2
-                    if v1 != outvert:
-                        v1.co = (v1.co+outvert.co) / 2
-                        hits += 1
+        # Target vertices. Mesh data is only accessed from main thread
+        jobs = []
+        for obj in targetobjects:
+            co, world, select = ReadVertexCoords(obj)
+            indices = np.flatnonzero(select) if self.selected_only else np.arange(len(co))
+            jobs.append((obj, co, indices, world[indices]))
         
-        for obj in context.selected_objects:
+        Snap = lambda job: SnapPoints(kd, anchors, job[3], self.merge_distance, self.snap)
+        if self.threads == 1 or len(jobs) <= 1:
+            results = [Snap(job) for job in jobs]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.threads or None) as executor:
+                results = list(executor.map(Snap, jobs))
+        
+        hits = 0
+        
+        for (obj, co, indices, points), (snapped, hit) in zip(jobs, results):
+            if not hit.any():
+                continue
+            
+            # Back to object space
+            inverse = np.linalg.inv(np.array(obj.matrix_world, dtype=np.float64))
+            co[indices[hit]] = snapped[hit] @ inverse[:3, :3].T + inverse[:3, 3]
+            
+            obj.data.vertices.foreach_set('co', co.ravel())
             obj.data.update()
+            hits += int(np.count_nonzero(hit))
         
         self.report({'INFO'}, "Snapped {0} vertices".format(hits))
         
@@ -531,13 +564,38 @@ classlist.append(DMR_OP_SnapVerticesOfMultipleObjects)
 
 # =============================================================================
 
+# Returns (weights, keep) for weight entries ordered by vertex after cleaning, limiting and normalizing.
+# Only entries with target set are changed. keep is False for entries to remove
+def CleanWeightEntries(vertices, weights, target, numverts, clean_threshold=0.0, limit=0, normalize=True):
+    weights = weights.copy()
+    keep = ~(target & (weights <= clean_threshold))
+    
+    # Keep highest weights of each vertex
+    if limit > 0:
+        candidates = np.flatnonzero(target & keep)
+        candidates = candidates[np.lexsort((-weights[candidates], vertices[candidates]))]
+        vertexorder = vertices[candidates]
+        firsts = np.searchsorted(vertexorder, vertexorder, side='left')
+        keep[candidates[(np.arange(len(candidates)) - firsts) >= limit]] = False
+    
+    if normalize:
+        active = target & keep
+        sums = np.bincount(vertices[active], weights=weights[active], minlength=numverts)[vertices]
+        active &= sums > 0.0
+        weights[active] = weights[active] / sums[active]
+    
+    return (weights, keep)
+
 class DMR_OP_BakeDataTransfer(bpy.types.Operator):
     bl_label = "Bake Data Transfer"
     bl_idname = 'dmr.bake_data_transfer'
     bl_description = 'Duplicates and applies all data transfer modifiers for selected objects'
     bl_options = {'REGISTER', 'UNDO'}
     
-    clean_threshold : bpy.props.FloatProperty(name="Clean Threshold")
+    clean_threshold : bpy.props.FloatProperty(name="Clean Threshold", min=0.0, max=1.0)
+    limit_total : bpy.props.IntProperty(name="Limit Total", default=0, min=0, description="Maximum deform groups per vertex. 0 for no limit")
+    normalize : bpy.props.BoolProperty(name="Normalize", default=True)
+    deform_only : bpy.props.BoolProperty(name="Deform Only", default=True, description="Only clean groups of deform bones of the object's armature")
     hide_viewport : bpy.props.BoolProperty(name="Hide Viewport", default=True)
     
     def invoke(self, context, event):
@@ -545,29 +603,24 @@ class DMR_OP_BakeDataTransfer(bpy.types.Operator):
     
     def execute(self, context):
         active = context.active_object
+        tstart = time.perf_counter()
+        objectcount = 0
         
         for obj in context.selected_objects:
-            deformgroups = []
-            rigobj = obj.find_armature()
-            if rigobj:
-                deformnames = [b.name for b in rigobj.data.bones if b.use_deform]
-                deformgroups = tuple([vg.index for vg in obj.vertex_groups if vg.name in deformnames])
+            if obj.type != 'MESH':
+                continue
             
+            t = time.perf_counter()
             context.view_layer.objects.active = obj
             modifiers = list(obj.modifiers)
-            verts = tuple(obj.data.vertices)
             hits = 0
             
-            print(obj.name)
-            
             # Apply modifiers
-            print("Apply Mods")
             for i,m in enumerate(obj.modifiers):
                 if m.name[0] in "~- ":
                     continue
                 
                 if m.type == 'DATA_TRANSFER':
-                    print(m.name)
                     bpy.ops.object.modifier_copy(modifier=m.name)
                     bpy.ops.object.modifier_apply(modifier=[x for x in obj.modifiers if x not in modifiers][0].name)
                     
@@ -575,22 +628,40 @@ class DMR_OP_BakeDataTransfer(bpy.types.Operator):
                         m.show_viewport = False
                     hits += 1
             
-            # Clean weights
-            if hits > 0:
-                print("Clean Weights")
-                vgroups = obj.vertex_groups
-                for vi, v in enumerate(verts):
-                    deformelements = [vge for vge in v.groups if vge.index in deformgroups]
-                    
-                    if len(deformelements):
-                        d = sum([vge.weight for vge in deformelements])
-                        for vge in deformelements:
-                            vge.weight *= len(deformelements)/d
-                        
-                        [vgroups[vge.group].remove([vi]) for vge in list(v.groups)[::-1] if vge.weight <= clean_threshold]
+            tapply = time.perf_counter() - t
+            
+            if hits == 0:
+                continue
+            objectcount += 1
+            
+            # Clean weights. Groups are read after applying as transfers may add groups
+            t = time.perf_counter()
+            vgroups = obj.vertex_groups
+            
+            targetgroups = np.ones(len(vgroups), dtype=bool)
+            if self.deform_only:
+                rigobj = obj.find_armature()
+                deformnames = [b.name for b in rigobj.data.bones if b.use_deform] if rigobj else []
+                targetgroups = np.array([vg.name in deformnames for vg in vgroups], dtype=bool).reshape(-1)
+            
+            table = dmr_weights.WeightTable(obj)
+            target = targetgroups[table.groups]
+            
+            newweights, keep = CleanWeightEntries(
+                table.vertices, table.weights, target, table.numverts,
+                self.clean_threshold, self.limit_total, self.normalize
+            )
+            
+            changed = keep & target & (newweights != table.weights)
+            table.Remove(vgroups, ~keep)
+            dmr_weights.WeightTable(obj, table.vertices, table.groups, newweights).Write(vgroups, changed)
+            
+            print("> %s: %d modifier(s) %.3fs, %d weight(s) removed, %d changed %.3fs" % (
+                obj.name, hits, tapply, (~keep).sum(), changed.sum(), time.perf_counter() - t))
         
         context.view_layer.objects.active = active
         
+        self.report({'INFO'}, "Baked %d object(s) in %.3fs" % (objectcount, time.perf_counter() - tstart))
         return {'FINISHED'}
 classlist.append(DMR_OP_BakeDataTransfer)
 
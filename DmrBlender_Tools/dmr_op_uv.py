@@ -1,5 +1,6 @@
 import bpy
 import os
+import numpy as np
 
 classlist = []
 
@@ -8,6 +9,148 @@ def Items_ObjectUVLayers(s, context):
         (x.name, x.name, x.name) for x in context.object.data.uv_layers
     )
 
+# (name, components, dtype) of per loop uv layer data
+UVLAYERFIELDS = (
+    ('uv', 2, np.float32),
+    ('pin_uv', 1, bool),
+    ('select', 1, bool),
+    ('select_edge', 1, bool),
+)
+
+# Returns tuple of arrays of layer data in UVLAYERFIELDS order
+def ReadUVLayer(lyr):
+    n = len(lyr.data)
+    data = []
+    for name, size, dtype in UVLAYERFIELDS:
+        values = np.empty(n*size, dtype=dtype)
+        lyr.data.foreach_get(name, values)
+        data.append(values)
+    return tuple(data)
+
+def WriteUVLayer(lyr, data):
+    for (name, size, dtype), values in zip(UVLAYERFIELDS, data):
+        lyr.data.foreach_set(name, values)
+
+# Reorders uv layers so that layer i takes data and name of layer order[i].
+# Only layers that move are read and written. Returns True if any layer moved
+def PermuteUVLayers(mesh, order):
+    layers = mesh.uv_layers
+    order = [int(x) for x in order]
+    if sorted(order) != list(range(len(layers))):
+        raise ValueError("Order is not a permutation of %d UV layers" % len(layers))
+    
+    moved = [i for i, j in enumerate(order) if i != j]
+    if not moved:
+        return False
+    
+    names = [lyr.name for lyr in layers]
+    activename = layers.active.name if layers.active else None
+    
+    data = {j: ReadUVLayer(layers[j]) for j in moved}
+    for i in moved:
+        WriteUVLayer(layers[i], data[order[i]])
+    
+    for i in moved:
+        layers[i].name = "__" + layers[i].name
+    for i in moved:
+        layers[i].name = names[order[i]]
+    
+    if activename:
+        layers.active = layers[activename]
+    return True
+
+# Returns (n, 2) array of uv coordinates of layer
+def ReadUVs(uvlyr):
+    uvs = np.empty(len(uvlyr.data)*2, dtype=np.float32)
+    uvlyr.data.foreach_get('uv', uvs)
+    return uvs.reshape(-1, 2)
+
+# Returns root index of each element after joining element pairs in links
+def ConnectedComponents(count, links):
+    parents = np.arange(count, dtype=np.int64)
+    if len(links) == 0:
+        return parents
+    
+    a = links[:, 0].astype(np.int64)
+    b = links[:, 1].astype(np.int64)
+    
+    # Disjoint-set with hooking to lower root and pointer jumping
+    while True:
+        ra = parents[a]
+        rb = parents[b]
+        unjoined = ra != rb
+        if not unjoined.any():
+            break
+        ra = ra[unjoined]
+        rb = rb[unjoined]
+        np.minimum.at(parents, np.maximum(ra, rb), np.minimum(ra, rb))
+        
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
+    
+    return parents
+
+# Returns (loops, islands, count) of uv islands over polygons in mask. islands[i] is island index of loops[i].
+# Loops of the same vertex with uvs within tolerance of each other are connected
+def FindUVIslands(mesh, uvlyr, polygonmask=None, tolerance=1e-5):
+    numpolys = len(mesh.polygons)
+    loopstarts = np.empty(numpolys, dtype=np.int64)
+    looptotals = np.empty(numpolys, dtype=np.int64)
+    mesh.polygons.foreach_get('loop_start', loopstarts)
+    mesh.polygons.foreach_get('loop_total', looptotals)
+    loopverts = np.empty(len(mesh.loops), dtype=np.int64)
+    mesh.loops.foreach_get('vertex_index', loopverts)
+    
+    polys = np.arange(numpolys) if polygonmask is None else np.flatnonzero(polygonmask)
+    totals = looptotals[polys]
+    loops = np.repeat(loopstarts[polys] - (np.cumsum(totals) - totals), totals) + np.arange(totals.sum())
+    looppolys = np.repeat(np.arange(len(polys)), totals)
+    
+    if len(loops) == 0:
+        return (loops, looppolys, 0)
+    
+    # Compare each loop with the following loops of the same vertex in vertex order
+    order = np.argsort(loopverts[loops], kind='stable')
+    sortedverts = loopverts[loops][order]
+    sorteduvs = ReadUVs(uvlyr)[loops][order].astype(np.float64)
+    sortedpolys = looppolys[order]
+    
+    links = [np.empty((0, 2), dtype=np.int64)]
+    k = 1
+    while k < len(order):
+        same = sortedverts[k:] == sortedverts[:-k]
+        if not same.any():
+            break
+        near = same & (((sorteduvs[k:] - sorteduvs[:-k])**2).sum(axis=1) <= tolerance*tolerance)
+        links.append(np.stack((sortedpolys[:-k][near], sortedpolys[k:][near]), axis=1))
+        k += 1
+    links = np.concatenate(links)
+    
+    _, polyislands = np.unique(ConnectedComponents(len(polys), links), return_inverse=True)
+    polyislands = polyislands.ravel()
+    return (loops, polyislands[looppolys], int(polyislands.max())+1)
+
+# Returns (count, 2) array of island centers. 'CENTROID' averages loop uvs, 'BOUNDS' uses bounding box center
+def UVIslandCenters(uvs, islands, count, align='CENTROID'):
+    if align == 'BOUNDS':
+        lo = np.full((count, 2), np.inf)
+        hi = np.full((count, 2), -np.inf)
+        np.minimum.at(lo, islands, uvs)
+        np.maximum.at(hi, islands, uvs)
+        return (lo + hi) * 0.5
+    
+    sums = np.stack([np.bincount(islands, weights=uvs[:, c], minlength=count) for c in range(2)], axis=1)
+    return sums / np.maximum(np.bincount(islands, minlength=count), 1)[:, None]
+
+# Moves islands of uvs so that island centers meet at target. uvs is modified in place
+def AlignUVIslands(uvs, loops, islands, count, target=(0.0, 0.0), align='CENTROID'):
+    centers = UVIslandCenters(uvs[loops], islands, count, align)
+    uvs[loops] += (np.asarray(target, dtype=np.float64) - centers)[islands].astype(uvs.dtype)
+    return uvs
+
 # =====================================================================================================
 
 class DMR_OP_FitMirrorModifierToUVEdge(bpy.types.Operator):
@@ -263,39 +406,7 @@ class DMR_OP_UVLayerMove(bpy.types.Operator):
             postnames = [x.name for x in layers if x.name != activelyrname]
             postnames.insert(len(layers), activelyrname)
         
-        # Check if changes were made
-        isequal = True
-        for n1, n2 in zip(prenames, postnames):
-            if n1 != n2:
-                isequal = False
-                break
-        
-        # Different name order from start
-        if not isequal:
-            lyrdatadict = {
-                lyr.name: [
-                    (tuple(e.uv), e.pin_uv, e.select, e.select_edge)
-                    for e in lyr.data
-                ]
-                for lyr in layers
-            }
-            
-            for lyrindex, name in enumerate(postnames):
-                newdata = lyrdatadict[name]
-                lyr = layers[lyrindex]
-                
-                for i, uv in enumerate(lyr.data):
-                    uv.uv = newdata[i][0]
-                    uv.pin_uv = newdata[i][1]
-                    uv.select = newdata[i][2]
-                    uv.select_edge = newdata[i][3]
-            
-            for lyr in layers:
-                lyr.name = "__" + lyr.name
-            for i, lyr in enumerate(layers):
-                lyr.name = postnames[i]
-            
-            layers.active = layers[activelyrname]
+        PermuteUVLayers(object.data, [prenames.index(name) for name in postnames])
         
         bpy.ops.object.mode_set(mode=lastmode)
             
@@ -310,6 +421,16 @@ class DMR_OP_StackUVIslands(bpy.types.Operator):
     bl_label = "Stack UV Islands"
     bl_options = {'REGISTER', 'UNDO'}   
     
+    align : bpy.props.EnumProperty(name="Align", default='CENTROID', items=(
+        ('CENTROID', "Centroid", "Align average of island UVs"),
+        ('BOUNDS', "Bounds", "Align center of island bounding box"),
+    ))
+    target : bpy.props.EnumProperty(name="Target", default='ORIGIN', items=(
+        ('ORIGIN', "Origin", "Stack islands on UV origin"),
+        ('ACTIVE', "Active Island", "Stack islands on island of active face"),
+    ))
+    tolerance : bpy.props.FloatProperty(name="Tolerance", default=1e-5, min=1e-8, precision=6, description="Distance for UVs of a vertex to count as shared")
+    
     @classmethod
     def poll(self, context):
         return context.object and context.object.type == 'MESH' and context.object.mode == 'EDIT'
@@ -320,53 +441,31 @@ class DMR_OP_StackUVIslands(bpy.types.Operator):
         lastmode = obj.mode
         bpy.ops.object.mode_set(mode='OBJECT')
         
-        uvlyr = obj.data.uv_layers.active
-        uvdata = tuple(uvlyr.data)
-        
-        polygons = tuple([p for p in obj.data.polygons if p.select])
-        targetloops = tuple(set([l for p in obj.data.polygons if p.select for l in p.loop_indices]))
-        uvpool = tuple([uvdata[l] for l in targetloops])
+        mesh = obj.data
+        uvlyr = mesh.uv_layers.active
         
-        def SharedUVs(p1, p2):
-            return sum([(uvdata[l1].uv == uvdata[l2].uv) for l1 in p1.loop_indices for l2 in p2.loop_indices]) > 0
+        select = np.empty(len(mesh.polygons), dtype=bool)
+        mesh.polygons.foreach_get('select', select)
         
-        nlast = -1
-        islands = [[p] for p in polygons]
+        loops, islands, count = FindUVIslands(mesh, uvlyr, select, self.tolerance)
+        uvs = ReadUVs(uvlyr)
         
-        while nlast != len(islands):
-            nlast = len(islands)
+        target = (0.0, 0.0)
+        if self.target == 'ACTIVE' and count > 0:
+            active = mesh.polygons.active
+            activeloops = (loops == mesh.polygons[active].loop_start) if 0 <= active < len(mesh.polygons) else np.zeros(0, dtype=bool)
             
-            for is1 in islands:
-                for is2 in islands:
-                    if is1 == is2:
-                        continue
-                    
-                    for p1 in is1:
-                        for p2 in is2:
-                            if SharedUVs(p1, p2):
-                                is1 += is2
-                                is2.clear()
-                                break
-            
-            for island in islands[::-1]:
-                if len(island) == 0:
-                    islands.remove(island)
+            if not activeloops.any():
+                self.report({'WARNING'}, 'Active face is not selected')
+                bpy.ops.object.mode_set(mode=lastmode)
+                return {'CANCELLED'}
             
-            print(len(islands))
+            target = UVIslandCenters(uvs[loops], islands, count, self.align)[islands[activeloops][0]]
         
-        uvislands = [ list(set(uvdata[l] for p in island for l in p.loop_indices)) for island in islands ]
+        AlignUVIslands(uvs, loops, islands, count, target, self.align)
+        uvlyr.data.foreach_set('uv', uvs.ravel())
         
-        for island in uvislands:
-            center = obj.location.to_2d()
-            center.zero()
-            
-            for uv in island:
-                center += uv.uv
-            
-            center /= len(island)
-            
-            for uv in island:
-                uv.uv -= center
+        print(count)
         
         bpy.ops.object.mode_set(mode=lastmode)
         return {'FINISHED'}
@@ -1,5 +1,8 @@
 import bpy
 import mathutils
+import numpy as np
+import concurrent.futures
+import functools
 
 classlist = []
 
@@ -26,26 +29,138 @@ def GetVCLayer(mesh, lyrname=""):
 
 # ----------------------------------------------------------------------------------
 
+# Returns array of loop indices for selection. Must be called in Object mode
+#   'FACE':   Loops of selected faces. Falls back to 'VERTEX' when no faces are selected
+#   'VERTEX': Loops of visible faces at selected vertices
+#   'MIXED':  Loops of selected faces, plus loops of visible faces at selected vertices not used by selected faces
+def ResolveTargetLoops(mesh, mode='FACE'):
+    numpolys = len(mesh.polygons)
+    polyselect = np.empty(numpolys, dtype=bool)
+    polyhide = np.empty(numpolys, dtype=bool)
+    looptotals = np.empty(numpolys, dtype=np.int32)
+    mesh.polygons.foreach_get('select', polyselect)
+    mesh.polygons.foreach_get('hide', polyhide)
+    mesh.polygons.foreach_get('loop_total', looptotals)
+    polyselect &= ~polyhide
+    
+    faceloops = np.repeat(polyselect, looptotals)
+    
+    if mode == 'FACE' and polyselect.any():
+        return np.flatnonzero(faceloops)
+    
+    numverts = len(mesh.vertices)
+    vertexselect = np.empty(numverts, dtype=bool)
+    vertexhide = np.empty(numverts, dtype=bool)
+    loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.vertices.foreach_get('select', vertexselect)
+    mesh.vertices.foreach_get('hide', vertexhide)
+    mesh.loops.foreach_get('vertex_index', loopverts)
+    vertexselect &= ~vertexhide
+    
+    vertexloops = np.repeat(~polyhide, looptotals) & vertexselect[loopverts]
+    
+    if mode == 'MIXED':
+        usedverts = np.zeros(numverts, dtype=bool)
+        usedverts[loopverts[faceloops]] = True
+        vertexloops = faceloops | (vertexloops & ~usedverts[loopverts])
+    
+    return np.flatnonzero(vertexloops)
+
+# Returns array of loop indices for selected faces, or loops of selected vertices if no faces are selected
 def GetTargetLoops(mesh, use_vertices=False):
-    targetpolys = [poly for poly in mesh.polygons if poly.select]
-    targetloops = []
-    
-    # Use faces
-    if targetpolys and not use_vertices:
-        targetloops = tuple(
-            l 
-            for p in targetpolys 
-            for l in mesh.loops[p.loop_start:p.loop_start + p.loop_total]
-            )
-    # Use vertices
+    return ResolveTargetLoops(mesh, 'VERTEX' if use_vertices else 'FACE')
+
+# Returns array of selected, visible vertex indices
+def GetTargetVertices(mesh):
+    vertexselect = np.empty(len(mesh.vertices), dtype=bool)
+    vertexhide = np.empty(len(mesh.vertices), dtype=bool)
+    mesh.vertices.foreach_get('select', vertexselect)
+    mesh.vertices.foreach_get('hide', vertexhide)
+    return np.flatnonzero(vertexselect & ~vertexhide)
+
+# ----------------------------------------------------------------------------------
+
+# Returns (n, 4) array of color layer values
+def ReadColorData(vclayer):
+    colors = np.empty(len(vclayer.data)*4, dtype=np.float32)
+    vclayer.data.foreach_get('color', colors)
+    return colors.reshape(-1, 4)
+
+# Returns (n, 4) array of colors per loop for point and corner color layers
+def ReadLoopColors(mesh, vclayer):
+    colors = ReadColorData(vclayer)
+    if getattr(vclayer, 'domain', 'CORNER') == 'POINT':
+        loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get('vertex_index', loopverts)
+        colors = colors[loopverts]
+    return colors
+
+# Linear sRGB (D65) to CIE XYZ, normalized by reference white
+RGBTOXYZ = np.array((
+    (0.4124564, 0.3575761, 0.1804375),
+    (0.2126729, 0.7151522, 0.0721750),
+    (0.0193339, 0.1191920, 0.9503041),
+    )) / np.array((0.95047, 1.0, 1.08883))[:, None]
+
+# Returns (n, 3) array of CIE Lab values for (n, 3+) array of linear colors
+def LinearToLab(colors):
+    xyz = np.maximum(colors[:, :3], 0.0) @ RGBTOXYZ.T
+    f = np.where(xyz > (6/29)**3, np.cbrt(xyz), xyz / (3*(6/29)**2) + 4/29)
+    return np.stack((116*f[:, 1]-16, 500*(f[:, 0]-f[:, 1]), 200*(f[:, 1]-f[:, 2])), axis=1)
+
+# ----------------------------------------------------------------------------------
+
+# Applies fn(colors, indices) -> colors to active color layer of each mesh for selected elements.
+# Layers are read and written on main thread. fn runs on a thread pool when threads != 1. Returns number of meshes changed
+def ProcessVertexColors(meshes, fn, use_vertices=False, threads=1):
+    jobs = []
+    
+    for mesh in list(dict.fromkeys(meshes)):
+        lyr = GetActiveVCLayer(mesh)
+        if not lyr:
+            continue
+        
+        if bpy.app.version >= (3,2,0) and lyr.domain in ['POINT', 'EDGE']:
+            indices = GetTargetVertices(mesh)
+        else:
+            indices = GetTargetLoops(mesh, use_vertices)
+        
+        if len(indices) > 0:
+            jobs.append((lyr, ReadColorData(lyr), indices))
+    
+    Process = lambda job: fn(job[1], job[2])
+    if threads == 1 or len(jobs) <= 1:
+        results = [Process(job) for job in jobs]
     else:
-        targetloops = tuple(
-            l
-            for p in mesh.polygons if not p.hide
-            for l in mesh.loops[p.loop_start:p.loop_start + p.loop_total] if mesh.vertices[l.vertex_index].select
-            )
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads or None) as executor:
+            results = list(executor.map(Process, jobs))
     
-    return targetloops
+    for (lyr, _, _), colors in zip(jobs, results):
+        lyr.data.foreach_set('color', colors.ravel())
+    
+    return len(jobs)
+
+# Returns colors with paint color blended into target indices that match target color.
+# Takes only plain values so it is safe to run on worker threads
+def BlendVertexColors(colors, indices, color, blend_mode, mix_amount, target_color, target_threshold, channels):
+    precolors = colors[indices]
+    
+    if blend_mode == 'MULTIPLY':
+        outcolors = precolors * color
+    elif blend_mode == 'ADD':
+        outcolors = np.minimum(precolors + color, 1.0)
+    else:
+        outcolors = np.broadcast_to(color, precolors.shape)
+    
+    outcolors = precolors + (outcolors - precolors) * mix_amount
+    
+    # Unmasked channels and unmatched colors keep their value
+    diff = target_color - precolors
+    matched = np.sqrt((diff*diff).sum(axis=1)) <= target_threshold * 4.0
+    keep = ~(matched[:, None] & channels)
+    
+    colors[indices] = np.where(keep, precolors, outcolors)
+    return colors
 
 # ----------------------------------------------------------------------------------
 
@@ -57,64 +172,41 @@ def PickColorFromObject(obj, use_render_layer=False):
     if not vclayer:
         return None
     
-    vcolors = vclayer.data
-    
-    targetloops = []
-    targetverts = []
-    
     # Blender 3.2
-    if bpy.app.version >= (3, 2, 2):
-        if vclayer.domain not in ['POINT', 'EDGE']:
-            targetloops = GetTargetLoops(mesh, False)
-        else:
-            targetverts = [v.index for v in mesh.vertices if ((not v.hide) and v.select)]
-        print("Domain:", vclayer.domain)
-    # < 3.2
+    if bpy.app.version >= (3, 2, 2) and vclayer.domain in ['POINT', 'EDGE']:
+        targetindices = GetTargetVertices(mesh)
+    # Corners, < 3.2
     else:
-        targetloops = GetTargetLoops(mesh, False)
+        targetindices = GetTargetLoops(mesh, False)
     
-    netcount = len(targetloops) + len(targetverts)
-    
-    if netcount == 0:
+    if len(targetindices) == 0:
         return None
-    else:
-        netcolor = mathutils.Vector((0,0,0,0))
-        
-        for l in targetloops:
-            netcolor += mathutils.Vector(vcolors[l.index].color)
-        for vi in targetverts:
-            netcolor += mathutils.Vector(vcolors[vi].color)
-        
-        netcolor /= netcount
-        
-    return netcolor
+    
+    return mathutils.Vector(ReadColorData(vclayer)[targetindices].mean(axis=0, dtype=np.float64))
 
 # ----------------------------------------------------------------------------------
 
+# Stores average color of selected loops per color layer. Returns number of loops sampled
 def PickNetFromObject(obj):
     mesh = obj.data
     settings = bpy.context.scene.edit_mode_color_settings
     netpick = settings.net_pick_colors
     
-    netpick.clear()
-    
-    verts = tuple(mesh.vertices)
-    polys = tuple(mesh.polygons)
-    loops = tuple(mesh.loops)
+    targetloops = ResolveTargetLoops(mesh, 'MIXED')
     
-    targetpolys = [p for p in polys if (p.hide and p.select)]
-    usedverts = [vi for p in targetpolys for vi in p.vertices]
-    targetloops = [l for p in polys if p in targetpolys for l in p.loop_indices]
-    targetloops += [l.index for l in loops if (l.vertex_index not in usedverts and verts[l.vertex_index].select and not verts[l.vertex_index].hide)]
+    if len(targetloops) == 0:
+        return 0
     
     print("{0} Loops selected".format(len(targetloops)))
     
+    netpick.clear()
+    
     for lyr in mesh.color_attributes:
-        lyrdata = lyrdata
         item = netpick.add()
-        
         item.layer = lyr.name
-        item.color = sum( [mathutils.Vector(vc.color) for vc in targetloops] )
+        item.color = ReadLoopColors(mesh, lyr)[targetloops].mean(axis=0, dtype=np.float64)
+    
+    return len(targetloops)
     
 '# =========================================================================================================================='
 '# OPERATORS'
@@ -144,6 +236,33 @@ class DMR_OP_SelectByVertexColor(bpy.types.Operator):
         description="Ignore alpha channel in comparison",
     )
     
+    compare_mode : bpy.props.EnumProperty(
+        name="Compare Mode", default='CHANNEL', items=(
+            ('CHANNEL', "Per Channel", "Each RGB channel must be within threshold"),
+            ('LAB', "Perceptual (Lab)", "Perceptual distance in CIE Lab space must be within Lab threshold"),
+        ),
+    )
+    
+    lab_thresh : bpy.props.FloatProperty(
+        name="Lab Threshold",
+        description='Threshold for perceptual comparison. Around 2.3 is a just noticeable difference',
+        soft_min=0.0,
+        soft_max=100.0,
+        default = 2.3
+    )
+    
+    # Returns mask of colors matching netcolor
+    def MatchColors(self, colors, netcolor):
+        if self.compare_mode == 'LAB':
+            diff = LinearToLab(colors) - LinearToLab(netcolor[None, :])
+            hits = (diff*diff).sum(axis=1) <= self.lab_thresh*self.lab_thresh
+        else:
+            hits = (np.abs(colors[:, :3] - netcolor[:3]) <= self.thresh).all(axis=1)
+        
+        if not self.ignore_alpha:
+            hits &= np.abs(colors[:, 3] - netcolor[3]) <= self.thresh
+        return hits
+    
     def execute(self, context):
         lastobjectmode = bpy.context.active_object.mode
         bpy.ops.object.mode_set(mode = 'OBJECT') # Update selected
@@ -154,39 +273,23 @@ class DMR_OP_SelectByVertexColor(bpy.types.Operator):
         
         if not GetActiveVCLayer(mesh):
             self.report({'WARNING'}, 'No vertex color data found for "%s"' % obj.name)
+            bpy.ops.object.mode_set(mode = lastobjectmode)
             return {'FINISHED'}
         
-        vcolors = GetActiveVCLayer(mesh, self.use_render_layer).data
+        polyselect = np.empty(len(mesh.polygons), dtype=bool)
+        mesh.polygons.foreach_get('select', polyselect)
+        vertexmode = not polyselect.any()
         
-        loops = mesh.loops
-        vertexmode = 0
-        
-        targetpolys = [poly for poly in mesh.polygons if poly.select]
-        vertexmode = len(targetpolys) == 0
         targetloops = GetTargetLoops(mesh)
         
-        if len(targetloops) > 0:
-            netcolor = [0.0, 0.0, 0.0, 0.0]
-            netcount = len(targetloops)
-            thresh = self.thresh
-            thresh *= thresh
-            for l in targetloops:
-                color = vcolors[l.index].color
-                netcolor[0] += color[0]
-                netcolor[1] += color[1]
-                netcolor[2] += color[2]
-                netcolor[3] += color[3]
-            netcolor[0] /= netcount
-            netcolor[1] /= netcount
-            netcolor[2] /= netcount
-            netcolor[3] /= netcount
-            print('net: %s' % netcolor)
-            nr = netcolor[0]
-            ng = netcolor[1]
-            nb = netcolor[2]
-            na = netcolor[3]
-        
-        ignore_alpha = self.ignore_alpha
+        if len(targetloops) == 0:
+            self.report({'WARNING'}, 'Nothing selected on "%s"' % obj.name)
+            bpy.ops.object.mode_set(mode = lastobjectmode)
+            return {'FINISHED'}
+        
+        loopcolors = ReadLoopColors(mesh, GetActiveVCLayer(mesh, self.use_render_layer))
+        netcolor = loopcolors[targetloops].mean(axis=0, dtype=np.float64)
+        print('net: %s' % netcolor.tolist())
         
         hits = 0
         
@@ -203,50 +306,36 @@ class DMR_OP_SelectByVertexColor(bpy.types.Operator):
                 continue
             
             print(obj.name)
-            vcolors = GetActiveVCLayer(mesh, self.use_render_layer).data
-            loops = mesh.loops
+            loopcolors = ReadLoopColors(mesh, GetActiveVCLayer(mesh, self.use_render_layer))
             
             # Faces
             if vertexmode == False:
-                for f in mesh.polygons:
-                    c2 = [0]*4
-                    for l in f.loop_indices:
-                        vc = vcolors[loops[l].index].color
-                        c2[0] += vc[0]
-                        c2[1] += vc[1]
-                        c2[2] += vc[2]
-                        c2[3] += vc[3]
-                    c2 = [x / len(f.loop_indices) for x in c2]
-                    r = c2[0]-nr
-                    g = c2[1]-ng
-                    b = c2[2]-nb
-                    a = c2[3]-na
-                    r*=r 
-                    g*=g 
-                    b*=b 
-                    a*=a
-                    if ignore_alpha:
-                        a = thresh
-                    if (r<=thresh and g<=thresh and b<=thresh and a<=thresh):
-                        f.select = True
-                        hits += 1
+                if len(mesh.polygons) == 0:
+                    continue
+                loopstarts = np.empty(len(mesh.polygons), dtype=np.int32)
+                looptotals = np.empty(len(mesh.polygons), dtype=np.int32)
+                mesh.polygons.foreach_get('loop_start', loopstarts)
+                mesh.polygons.foreach_get('loop_total', looptotals)
+                
+                facecolors = np.add.reduceat(loopcolors.astype(np.float64), loopstarts, axis=0) / looptotals[:, None]
+                matched = self.MatchColors(facecolors, netcolor)
+                
+                select = np.empty(len(mesh.polygons), dtype=bool)
+                mesh.polygons.foreach_get('select', select)
+                mesh.polygons.foreach_set('select', select | matched)
             # Vertices
             else:
-                for l in [x for x in loops if x not in targetloops]:
-                    c2 = vcolors[l.index].color
-                    r = c2[0]-nr
-                    g = c2[1]-ng
-                    b = c2[2]-nb
-                    a = c2[3]-na
-                    r*=r 
-                    g*=g 
-                    b*=b 
-                    a*=a
-                    if ignore_alpha:
-                        a = 0.0
-                    if (r<=thresh and g<=thresh and b<=thresh and a<=thresh):
-                        mesh.vertices[l.vertex_index].select = True
-                        hits += 1
+                loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+                mesh.loops.foreach_get('vertex_index', loopverts)
+                
+                matched = np.zeros(len(mesh.vertices), dtype=bool)
+                matched[loopverts[self.MatchColors(loopcolors, netcolor)]] = True
+                
+                select = np.empty(len(mesh.vertices), dtype=bool)
+                mesh.vertices.foreach_get('select', select)
+                mesh.vertices.foreach_set('select', select | matched)
+            
+            hits += int(np.count_nonzero(matched))
         
         print("Hits: %d" % hits)
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
@@ -294,6 +383,19 @@ class DMR_OP_SetVertexColor_Super(bpy.types.Operator):
         name="Channels", size=4, default=(True, True, True, True)
     )
     
+    blend_mode : bpy.props.EnumProperty(
+        name="Blend Mode", default='SET', items=(
+            ('SET', "Set", "Replace color"),
+            ('MULTIPLY', "Multiply", "Multiply existing color by paint color"),
+            ('ADD', "Add", "Add paint color to existing color"),
+        ),
+    )
+    
+    threads : bpy.props.IntProperty(
+        name="Threads", default=1, min=0,
+        description="Number of threads used to process meshes. 0 = Automatic",
+    )
+    
     def invoke(self, context, event):
         bpy.ops.object.mode_set(mode='OBJECT') # Update selected
         
@@ -306,17 +408,10 @@ class DMR_OP_SetVertexColor_Super(bpy.types.Operator):
                 if not mesh.vertex_colors:
                     mesh.vertex_colors.new()
             
-            vcolors = GetActiveVCLayer(mesh).data
-            selectedpolys = [p for p in mesh.polygons if p.select]
-            if selectedpolys:
-                self.target_color = vcolors[selectedpolys[0].loop_indices[0]].color
+            targetloops = GetTargetLoops(mesh)
+            if len(targetloops):
+                self.target_color = ReadLoopColors(mesh, GetActiveVCLayer(mesh))[targetloops[0]]
                 break
-            else:
-                selectedvertexindices = [v.index for v in mesh.vertices if v.select]
-                selectedloops = [l for vi in selectedvertexindices for l in mesh.loops if l.vertex_index == vi]
-                if selectedloops:
-                    self.target_color = vcolors[selectedloops[0].index].color
-                    break
             
         bpy.ops.object.mode_set(mode='EDIT') # Update selected
         
@@ -330,6 +425,7 @@ class DMR_OP_SetVertexColor_Super(bpy.types.Operator):
         cc = c.column(align=1)
         cc.prop(self, 'color')
         cc.prop(self, 'mix_amount')
+        cc.prop(self, 'blend_mode', text="")
         
         cc = c.column(align=1)
         cc.prop(self, 'target_color')
@@ -342,55 +438,25 @@ class DMR_OP_SetVertexColor_Super(bpy.types.Operator):
         r.prop(self, 'channels', text="A", index=3)
         
         c.prop(self, 'use_vertices')
+        c.prop(self, 'threads')
     
     def execute(self, context):
         lastobjectmode = bpy.context.active_object.mode
         bpy.ops.object.mode_set(mode = 'OBJECT') # Update selected
         
-        amt = 1.0-self.mix_amount
-        
-        newcolor = mathutils.Vector(self.color)
-        channels = tuple(self.channels)
+        meshes = [obj.data for obj in [x for x in context.selected_objects]+[context.object] if obj.type == 'MESH']
         
-        targetcolor = mathutils.Vector(self.target_color)
-        targetthresh = self.target_color_threshold * 4.0
+        # Operator properties are read here so workers only see plain values
+        blend = functools.partial(BlendVertexColors,
+            color=np.array(self.color, dtype=np.float32),
+            blend_mode=self.blend_mode,
+            mix_amount=float(self.mix_amount),
+            target_color=np.array(self.target_color, dtype=np.float32),
+            target_threshold=float(self.target_color_threshold),
+            channels=np.array(self.channels, dtype=bool),
+        )
+        ProcessVertexColors(meshes, blend, self.use_vertices, self.threads)
         
-        for mesh in [obj.data for obj in [x for x in context.selected_objects]+[context.object] if obj.type == 'MESH']:
-            lyr = GetActiveVCLayer(mesh)
-            vcolors = lyr.data
-            
-            targetloops = []
-            targetindices = []
-            
-            if bpy.app.version >= (3,2,0) and lyr.domain in ['POINT', 'EDGE']:
-                targetindices = [v.index for v in mesh.vertices if (v.select and not v.hide)]
-            else:
-                targetloops = GetTargetLoops(mesh, self.use_vertices)
-            
-            # Set colors
-            for l in targetloops:
-                vcelement = vcolors[l.index]
-                precolor = mathutils.Vector(vcelement.color)
-                
-                if (targetcolor-precolor).length <= targetthresh:
-                    outcolor = newcolor.lerp(precolor, amt)
-                    
-                    vcelement.color[0] = outcolor[0] if channels[0] else precolor[0]
-                    vcelement.color[1] = outcolor[1] if channels[1] else precolor[1]
-                    vcelement.color[2] = outcolor[2] if channels[2] else precolor[2]
-                    vcelement.color[3] = outcolor[3] if channels[3] else precolor[3]
-            for vi in targetindices:
-                vcelement = vcolors[vi]
-                precolor = mathutils.Vector(vcelement.color)
-                
-                if (targetcolor-precolor).length <= targetthresh:
-                    outcolor = newcolor.lerp(precolor, amt)
-                    
-                    vcelement.color[0] = outcolor[0] if channels[0] else precolor[0]
-                    vcelement.color[1] = outcolor[1] if channels[1] else precolor[1]
-                    vcelement.color[2] = outcolor[2] if channels[2] else precolor[2]
-                    vcelement.color[3] = outcolor[3] if channels[3] else precolor[3]
-            
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
         return {'FINISHED'}
 
@@ -420,14 +486,14 @@ class DMR_OP_AdjustVertexColor(DMR_OP_SetVertexColor_Super):
         lastobjectmode = bpy.context.active_object.mode
         bpy.ops.object.mode_set(mode = 'OBJECT') # Update selected
         
-        loops = [l.index for l in obj.data.loops if obj.data.vertices[l.vertex_index].select]
+        loops = GetTargetLoops(obj.data, True)
         
         if len(loops) == 0:
             self.report({'WARNING'}, "No vertices selected")
             bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
             return {'FINISHED'}
         
-        self.color = [ obj.data.vertex_colors.active.data[l] for l in loops ][0].color
+        self.color = ReadLoopColors(obj.data, GetActiveVCLayer(obj.data))[loops[0]]
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
         
         return self.execute(context)
@@ -469,17 +535,20 @@ class DMR_OP_SetVertexColorChannel(bpy.types.Operator):
         lastobjectmode = bpy.context.active_object.mode
         bpy.ops.object.mode_set(mode = 'OBJECT') # Update selected
         
-        for obj in set([x for x in context.selected_objects] + [context.object]):
-            if obj.type != 'MESH': 
-                continue
-            
-            mesh = obj.data
+        meshes = [obj.data for obj in set([x for x in context.selected_objects] + [context.object]) if obj.type == 'MESH']
+        
+        for mesh in meshes:
             if not mesh.vertex_colors:
                 mesh.vertex_colors.new()
-            vcolors = GetActiveVCLayer(mesh).data
-            
-            for l in GetTargetLoops(mesh, self.use_vertices):
-                vcolors[l.index].color[self.channelindex] = self.channelvalue
+        
+        channelindex = self.channelindex
+        channelvalue = self.channelvalue
+        
+        def SetChannel(colors, indices):
+            colors[indices, channelindex] = channelvalue
+            return colors
+        
+        ProcessVertexColors(meshes, SetChannel, self.use_vertices)
         
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
         
@@ -505,19 +574,19 @@ class DMR_OP_VertexColorClearAlpha(bpy.types.Operator):
         lastobjectmode = bpy.context.active_object.mode
         bpy.ops.object.mode_set(mode = 'OBJECT') # Update selected
         
-        for obj in context.selected_objects:
-            if obj.type != 'MESH': 
-                continue
-            
-            mesh = obj.data
+        meshes = [obj.data for obj in context.selected_objects if obj.type == 'MESH']
+        
+        for mesh in meshes:
             if not mesh.vertex_colors:
                 mesh.vertex_colors.new()
-            vcolors = GetActiveVCLayer(mesh).data
-            loops = mesh.loops
-            
-            targetloops = GetTargetLoops(mesh)
-            for l in targetloops:
-                vcolors[l.index].color[3] = self.clearvalue
+        
+        clearvalue = self.clearvalue
+        
+        def SetAlpha(colors, indices):
+            colors[indices, 3] = clearvalue
+            return colors
+        
+        ProcessVertexColors(meshes, SetAlpha)
         
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
         return {'FINISHED'}
@@ -876,15 +945,15 @@ class DMR_OP_VertexColorGammaCorrect(bpy.types.Operator):
             if self.selectedonly:
                 targetloops = GetTargetLoops(mesh, self.use_vertices)
             else:
-                targetloops = tuple(mesh.loops)
+                targetloops = np.arange(len(mesh.loops))
             
             # Set colors
             if not self.revert:
-                for l in targetloops:
-                    vcolors[l.index].color[:3] = mathutils.Color(vcolors[l.index].color[:3]).from_scene_linear_to_srgb()
+                for l in targetloops.tolist():
+                    vcolors[l].color[:3] = mathutils.Color(vcolors[l].color[:3]).from_scene_linear_to_srgb()
             else:
-                for l in targetloops:
-                    vcolors[l.index].color[:3] = mathutils.Color(vcolors[l.index].color[:3]).from_srgb_to_scene_linear()
+                for l in targetloops.tolist():
+                    vcolors[l].color[:3] = mathutils.Color(vcolors[l].color[:3]).from_srgb_to_scene_linear()
             
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
         return {'FINISHED'}
@@ -902,34 +971,8 @@ class DMR_OP_PickVertexColorAll(bpy.types.Operator):
         lastobjectmode = bpy.context.active_object.mode
         bpy.ops.object.mode_set(mode = 'OBJECT') # Update selected
         
-        obj = context.active_object
-        mesh = obj.data
-        settings = bpy.context.scene.edit_mode_color_settings
-        netpick = settings.net_pick_colors
-        
-        verts = tuple(mesh.vertices)
-        polys = tuple(mesh.polygons)
-        loops = tuple(mesh.loops)
-        
-        targetpolys = [p for p in polys if (p.hide and p.select)]
-        usedverts = [vi for p in targetpolys for vi in p.vertices]
-        targetloops = [l for p in polys if p in targetpolys for l in p.loop_indices]
-        targetloops += [l.index for l in loops if (l.vertex_index not in usedverts and verts[l.vertex_index].select and not verts[l.vertex_index].hide)]
-        
-        if len(targetloops) == 0:
+        if PickNetFromObject(context.active_object) == 0:
             self.report({'WARNING'}, 'No loops selected')
-        else:
-            print("{0} Loops selected".format(len(targetloops)))
-            
-            netpick.clear()
-            
-            for lyr in mesh.color_attributes:
-                item = netpick.add()
-                item.layer = lyr.name
-                netcolor = mathutils.Vector((0,0,0,0))
-                for l in targetloops:
-                    netcolor += mathutils.Vector(lyr.data[l].color)
-                item.color = netcolor / len(targetloops)
         
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
         return {'FINISHED'}
@@ -958,20 +1001,12 @@ class DMR_OP_PaintVertexColorAll(bpy.types.Operator):
         settings = bpy.context.scene.edit_mode_color_settings
         netpick = settings.net_pick_colors
         
-        verts = tuple(mesh.vertices)
-        polys = tuple(mesh.polygons)
-        loops = tuple(mesh.loops)
-        
-        targetpolys = [p for p in polys if (p.select and not p.hide)]
-        usedverts = [vi for p in targetpolys for vi in p.vertices]
-        targetloops = [l for p in polys if p in targetpolys for l in p.loop_indices]
-        targetloops += [l.index for l in loops if (l.vertex_index not in usedverts and verts[l.vertex_index].select and not verts[l.vertex_index].hide)]
+        targetloops = ResolveTargetLoops(mesh, 'MIXED')
         
         if len(targetloops) == 0:
             self.report({'WARNING'}, 'No loops selected')
         else:
             print("{0} Loops selected".format(len(targetloops)))
-            print("Why")
             
             vclayers = mesh.color_attributes
             
@@ -982,9 +1017,16 @@ class DMR_OP_PaintVertexColorAll(bpy.types.Operator):
             
                 if pick.layer in vclayers.keys():
                     lyr = vclayers[pick.layer]
+                    colors = ReadColorData(lyr)
+                    
+                    if lyr.domain == 'POINT':
+                        loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+                        mesh.loops.foreach_get('vertex_index', loopverts)
+                        colors[loopverts[targetloops]] = np.array(pick.color, dtype=np.float32)
+                    else:
+                        colors[targetloops] = np.array(pick.color, dtype=np.float32)
                     
-                    for l in targetloops:
-                        lyr.data[l].color = pick.color
+                    lyr.data.foreach_set('color', colors.ravel())
         
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
         return {'FINISHED'}
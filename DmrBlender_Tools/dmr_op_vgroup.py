@@ -1,7 +1,96 @@
 import bpy
+import heapq
+import importlib
+import numpy as np
+
+# Shared weight table module. Loaded before operator modules by __init__
+dmr_weights = importlib.import_module(__name__.rpartition('.')[0] + '.dmr_weights' if '.' in __name__ else 'dmr_weights')
 
 classlist = []
 
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+# Returns (offsets, neighbors, lengths) vertex adjacency of mesh in CSR layout.
+# Neighbors of vertex i are neighbors[offsets[i]:offsets[i+1]]
+def VertexAdjacency(mesh):
+    n = len(mesh.vertices)
+    co = np.empty(n*3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    co = co.reshape(-1, 3)
+    edgeverts = np.empty(len(mesh.edges)*2, dtype=np.int32)
+    mesh.edges.foreach_get('vertices', edgeverts)
+    edgeverts = edgeverts.reshape(-1, 2)
+    
+    src = np.concatenate([edgeverts[:, 0], edgeverts[:, 1]])
+    dst = np.concatenate([edgeverts[:, 1], edgeverts[:, 0]])
+    order = np.argsort(src, kind='stable')
+    
+    offsets = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+    lengths = np.linalg.norm(co[src] - co[dst], axis=1)
+    return (offsets, dst[order], lengths[order])
+
+# Returns array of neighbor indices for array of vertices
+def GatherNeighbors(offsets, neighbors, vertices):
+    starts = offsets[vertices]
+    counts = offsets[vertices+1] - starts
+    firsts = np.cumsum(counts) - counts
+    return neighbors[np.repeat(starts - firsts, counts) + np.arange(counts.sum())]
+
+# Returns breadth-first ring index of each vertex from seeds. -1 for vertices past maxsteps
+def VertexSteps(offsets, neighbors, seeds, maxsteps):
+    steps = np.full(len(offsets)-1, -1, dtype=np.int32)
+    frontier = np.unique(seeds)
+    steps[frontier] = 0
+    
+    for step in range(1, maxsteps+1):
+        if len(frontier) == 0:
+            break
+        frontier = np.unique(GatherNeighbors(offsets, neighbors, frontier))
+        frontier = frontier[steps[frontier] < 0]
+        steps[frontier] = step
+    return steps
+
+# Returns shortest edge path length of each vertex from nearest seed. inf for unreached vertices.
+# Only vertices in mask are traversed
+def VertexGeodesic(offsets, neighbors, lengths, seeds, mask):
+    distance = np.full(len(offsets)-1, np.inf)
+    offsets = offsets.tolist()
+    neighbors = neighbors.tolist()
+    lengths = lengths.tolist()
+    mask = mask.tolist()
+    
+    heap = [(0.0, vi) for vi in set(np.asarray(seeds).tolist())]
+    best = {vi: 0.0 for d,vi in heap}
+    
+    while heap:
+        d, vi = heapq.heappop(heap)
+        if d > best[vi]:
+            continue
+        for k in range(offsets[vi], offsets[vi+1]):
+            nb = neighbors[k]
+            nd = d + lengths[k]
+            if mask[nb] and nd < best.get(nb, np.inf):
+                best[nb] = nd
+                heapq.heappush(heap, (nd, nb))
+    
+    distance[list(best.keys())] = list(best.values())
+    return distance
+
+# Returns falloff curve applied to array of values in [0, 1]
+def FalloffCurve(t, curve='LINEAR'):
+    if curve == 'SMOOTH':
+        return t*t*(3.0-2.0*t)
+    elif curve == 'SHARP':
+        return t*t
+    elif curve == 'ROOT':
+        return np.sqrt(t)
+    elif curve == 'SPHERE':
+        return 1.0-np.sqrt(1.0-t*t)
+    return t
+
 # =============================================================================
 # OPERATORS
 # =============================================================================
@@ -51,7 +140,7 @@ class DMR_OT_AddVertexGroup(bpy.types.Operator):
             vg = vgroups[self.group_name]
             
             if self.assign_selected:
-                vg.add([v.index for v in obj.data.vertices if v.select], self.weight, self.type)
+                vg.add(np.flatnonzero(dmr_weights.ReadVertexSelection(obj.data)).tolist(), self.weight, self.type)
         
         bpy.ops.object.mode_set(mode=mode)
         return {'FINISHED'}
@@ -85,7 +174,7 @@ class DMR_OT_RemoveVerticesFromVertexGroup(bpy.types.Operator):
             vgroups = obj.vertex_groups
             if self.group_name in vgroups.keys():
                 vg = vgroups[self.group_name]
-                vg.remove([v.index for v in obj.data.vertices if v.select])
+                vg.remove(np.flatnonzero(dmr_weights.ReadVertexSelection(obj.data)).tolist())
         
         bpy.ops.object.mode_set(mode=mode)
         return {'FINISHED'}
@@ -122,27 +211,22 @@ class DMR_OP_SelectByWeight(bpy.types.Operator):
         object = bpy.context.active_object
         vgroupindex = object.vertex_groups.active.index
         
-        compmode = 0
         threshold = self.threshold
         
         bpy.ops.object.mode_set(mode = 'OBJECT')
         
-        # Greater Than
-        if compmode == 0:
-            for v in object.data.vertices:
-                for vge in v.groups:
-                    if vge.group == vgroupindex:
-                        if vge.weight >= threshold:
-                            v.select = True
-                        break
+        # Vertices outside of group are NaN and never compare
+        weights = dmr_weights.WeightTable(object).GroupWeights(vgroupindex)
+        select = dmr_weights.ReadVertexSelection(object.data)
+        
         # Less Than
+        if self.compmode:
+            select |= weights <= threshold
+        # Greater Than
         else:
-            for v in object.data.vertices:
-                for vge in v.groups:
-                    if vge.group == vgroupindex:
-                        if vge.weight <= threshold:
-                            v.select = True
-                        break
+            select |= weights >= threshold
+        
+        object.data.vertices.foreach_set('select', select)
         
         bpy.ops.object.mode_set(mode = 'EDIT')
         
@@ -166,11 +250,9 @@ class DMR_OP_ClearWeights(bpy.types.Operator):
             vertexgroups = selectedObject.vertex_groups
             
             # Remove Groups
-            for v in selectedObject.data.vertices:
-                if v.select:
-                    for vge in v.groups:
-                        if not vertexgroups[vge.group].lock_weight:
-                            vertexgroups[vge.group].remove([v.index]);
+            table = dmr_weights.WeightTable(selectedObject).FilterVertices(dmr_weights.ReadVertexSelection(selectedObject.data))
+            locked = np.array([vg.lock_weight for vg in vertexgroups], dtype=bool)
+            table.Remove(vertexgroups, ~locked[table.groups])
                 
             bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
             
@@ -218,13 +300,8 @@ class DMR_OP_RemoveUnusedVertexGroups(bpy.types.Operator):
             if not vgroups:
                 continue
             
-            usedgroupnames = [
-                vgroups[vge.group].name
-                for v in obj.data.vertices
-                for vge in v.groups if (
-                    (not self.remove_zero or vge.weight > 0.0)
-                )
-            ]
+            usedgroups = dmr_weights.WeightTable(obj).UsedGroups(0.0 if self.remove_zero else None)
+            usedgroupnames = [vg.name for vg, used in zip(vgroups, usedgroups) if used]
             usedgroupnames += [vg.name for vg in vgroups if vg.lock_weight]
             
             # Check Modifiers
@@ -341,14 +418,11 @@ class DMR_OP_RemoveFromSelectedBones(bpy.types.Operator):
         # Find selected vertices
         for obj in context.selected_objects:
             if obj.type == 'MESH':
-                targetgroups = {x.index: x for x in obj.vertex_groups if x.name in selectedbones}
-                verts = [x for x in obj.data.vertices if x.select]
+                targetgroups = [x.index for x in obj.vertex_groups if x.name in selectedbones]
+                table = dmr_weights.WeightTable(obj).FilterVertices(dmr_weights.ReadVertexSelection(obj.data))
                 
                 # Pop vertex from selected bone groups
-                for v in verts:
-                    for vge in v.groups:
-                        if vge.group in targetgroups.keys():
-                            targetgroups[vge.group].remove( [v.index] )
+                table.Remove(obj.vertex_groups, table.InGroups(targetgroups))
         
         bpy.ops.object.mode_set(mode = lastobjectmode) # Return to last mode
         return {'FINISHED'}
@@ -452,7 +526,7 @@ classlist.append(DMR_OP_MoveVertexGroupToEnd)
 # ---------------------------------------------------------------------------
 
 class DMR_OT_SetWeightByVertexStep(bpy.types.Operator):
-    """Sets weight for each vertex by stepping from selected vertex"""
+    """Sets weight for each vertex by stepping from selected vertices"""
     bl_idname = "dmr.set_weight_by_step"
     bl_label = "Set Weight by Step"
     bl_options = {'REGISTER', 'UNDO'}
@@ -460,6 +534,17 @@ class DMR_OT_SetWeightByVertexStep(bpy.types.Operator):
     count : bpy.props.IntProperty(name="Step Count", min=0, default = 5)
     weight_start : bpy.props.FloatProperty(name="Weight Start", min=0, max=1, default=1.0)
     weight_end : bpy.props.FloatProperty(name="Weight End", min=0, max=1, default=0.0)
+    falloff : bpy.props.EnumProperty(name="Falloff", default='STEP', items=(
+        ('STEP', "Step", "Weight by number of edges from nearest selected vertex"),
+        ('GEODESIC', "Geodesic", "Weight by edge path length from nearest selected vertex"),
+    ))
+    curve : bpy.props.EnumProperty(name="Curve", default='LINEAR', items=(
+        ('LINEAR', "Linear", "Linear interpolation"),
+        ('SMOOTH', "Smooth", "Smoothstep interpolation"),
+        ('SHARP', "Sharp", "Quadratic interpolation"),
+        ('ROOT', "Root", "Square root interpolation"),
+        ('SPHERE', "Sphere", "Spherical interpolation"),
+    ))
     
     @classmethod
     def poll(cls, context):
@@ -467,29 +552,34 @@ class DMR_OT_SetWeightByVertexStep(bpy.types.Operator):
     
     def execute(self, context):
         obj = context.object
+        vgroup = obj.vertex_groups.active
+        
+        if not vgroup:
+            self.report({'WARNING'}, 'No active vertex group')
+            return {'CANCELLED'}
+        
         mode = obj.mode
         bpy.ops.object.mode_set(mode='OBJECT')
-        vertices = tuple(obj.data.vertices)
-        edges = tuple(obj.data.edges)
-        
-        vgroup = obj.vertex_groups.active
+        mesh = obj.data
         
-        wstart = self.weight_start
-        wend = self.weight_end
-        wdist = wend-wstart
+        select = np.empty(len(mesh.vertices), dtype=bool)
+        mesh.vertices.foreach_get('select', select)
+        seeds = np.flatnonzero(select)
         
         n = self.count
-        vertexindices = [v.index for v in vertices if v.select]
-        vgroup.add(vertexindices, wstart, 'REPLACE')
+        offsets, neighbors, lengths = VertexAdjacency(mesh)
+        steps = VertexSteps(offsets, neighbors, seeds, n)
+        vertices = np.flatnonzero(steps >= 0)
+        
+        # Ring n reaches weight_end
+        if self.falloff == 'GEODESIC':
+            distance = VertexGeodesic(offsets, neighbors, lengths, seeds, steps >= 0)[vertices]
+            t = distance / max(distance.max(), 1e-8) if len(distance) else distance
+        else:
+            t = steps[vertices] / max(n, 1)
         
-        for iteration in range(0, n):
-            nextverts = [vi for e in edges if (e.vertices[0] in vertexindices or e.vertices[1] in vertexindices) for vi in e.vertices]
-            newverts = [vi for vi in nextverts if vi not in vertexindices]
-            
-            amt = ( max(0, iteration/(n-1)) )
-            weight = amt * wdist + wstart
-            vgroup.add(newverts, weight, 'REPLACE')
-            vertexindices += newverts
+        weights = self.weight_start + (self.weight_end-self.weight_start) * FalloffCurve(t, self.curve)
+        dmr_weights.AddVertexWeights(vgroup, vertices, weights.astype(np.float32), 'REPLACE')
         
         bpy.ops.object.mode_set(mode=mode)
         return {'FINISHED'}
@@ -513,12 +603,11 @@ class DMR_OP_WeightChecklist(bpy.types.Operator):
     def invoke(self, context, event):
         bpy.ops.object.mode_set(mode='OBJECT') # Update selected
         
-        groupnames = [
-            obj.vertex_groups[vge.group].name
-            for obj in context.selected_objects if obj.type == 'MESH'
-            for v in obj.data.vertices if v.select
-            for vge in v.groups
-        ]
+        groupnames = []
+        for obj in context.selected_objects:
+            if obj.type == 'MESH':
+                usedgroups = dmr_weights.WeightTable(obj).FilterVertices(dmr_weights.ReadVertexSelection(obj.data)).UsedGroups()
+                groupnames += [vg.name for vg, used in zip(obj.vertex_groups, usedgroups) if used]
         
         #groupnames.sort(key=lambda x: groupnames.count(x))
         groupnames = list(set(groupnames))
@@ -541,23 +630,13 @@ class DMR_OP_WeightChecklist(bpy.types.Operator):
     
     def execute(self, context):
         bpy.ops.object.mode_set(mode='OBJECT') # Update selected
-        vertices = tuple([
-            v.index
-            for obj in context.selected_objects if obj.type == 'MESH'
-            for v in obj.data.vertices if v.select
-        ])
-        
         targetgroupnames = [g.name for g in self.groups if not g.enabled]
-        targetgroups = [
-            vg
-            for obj in context.selected_objects if obj.type == 'MESH'
-            for vg in obj.vertex_groups if vg.name in targetgroupnames
-        ]
         
-        [
-            vg.remove(vertices)
-            for vg in targetgroups
-        ]
+        for obj in context.selected_objects:
+            if obj.type == 'MESH':
+                targetgroups = [vg.index for vg in obj.vertex_groups if vg.name in targetgroupnames]
+                table = dmr_weights.WeightTable(obj).FilterVertices(dmr_weights.ReadVertexSelection(obj.data))
+                table.Remove(obj.vertex_groups, table.InGroups(targetgroups))
         
         bpy.ops.object.mode_set(mode='EDIT')
             
@@ -0,0 +1,120 @@
+import bpy
+import numpy as np
+
+# Vertex group weight helpers shared by operator modules
+
+# =============================================================================
+
+# Adds weights to vertex group with one add() call per unique weight
+def AddVertexWeights(vgroup, vertices, weights, type='REPLACE'):
+    order = np.argsort(weights, kind='stable')
+    vertices = np.asarray(vertices)[order]
+    values, starts = np.unique(np.asarray(weights)[order], return_index=True)
+    
+    for w, indices in zip(values.tolist(), np.split(vertices, starts[1:])):
+        vgroup.add(indices.tolist(), w, type)
+
+# Returns boolean array of vertex selection
+def ReadVertexSelection(mesh):
+    select = np.empty(len(mesh.vertices), dtype=bool)
+    mesh.vertices.foreach_get('select', select)
+    return select
+
+# Sparse (vertex, group, weight) entries of every vertex group weight on an object, ordered by vertex.
+# Entries of vertex i are entries[offsets[i]:offsets[i+1]]
+class WeightTable:
+    def __init__(self, obj, vertices=None, groups=None, weights=None):
+        self.numverts = len(obj.data.vertices)
+        self.numgroups = len(obj.vertex_groups)
+        
+        if vertices is None:
+            entries = [
+                (v.index, vge.group, vge.weight)
+                for v in obj.data.vertices
+                for vge in v.groups
+            ]
+            entries = np.array(entries, dtype=np.float64).reshape(-1, 3)
+            vertices, groups, weights = entries[:, 0], entries[:, 1], entries[:, 2]
+        
+        self.vertices = np.asarray(vertices, dtype=np.int32)
+        self.groups = np.asarray(groups, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        
+        self.offsets = np.zeros(self.numverts+1, dtype=np.int64)
+        np.cumsum(np.bincount(self.vertices, minlength=self.numverts), out=self.offsets[1:])
+    
+    def __len__(self):
+        return len(self.vertices)
+    
+    # Returns table of entries in mask
+    def Filter(self, mask):
+        table = WeightTable.__new__(WeightTable)
+        table.numverts = self.numverts
+        table.numgroups = self.numgroups
+        table.vertices = self.vertices[mask]
+        table.groups = self.groups[mask]
+        table.weights = self.weights[mask]
+        table.offsets = np.zeros(self.numverts+1, dtype=np.int64)
+        np.cumsum(np.bincount(table.vertices, minlength=self.numverts), out=table.offsets[1:])
+        return table
+    
+    # Returns table of entries for vertices in vertex mask
+    def FilterVertices(self, vertexmask):
+        return self.Filter(np.asarray(vertexmask, dtype=bool)[self.vertices])
+    
+    # Returns entry mask for entries in any of group indices
+    def InGroups(self, groups):
+        groupmask = np.zeros(self.numgroups, dtype=bool)
+        groupmask[np.asarray(list(groups), dtype=np.int32)] = True
+        return groupmask[self.groups]
+    
+    # Returns boolean array of groups with at least one weight above min_weight
+    def UsedGroups(self, min_weight=None):
+        groups = self.groups if min_weight is None else self.groups[self.weights > min_weight]
+        return np.bincount(groups, minlength=self.numgroups) > 0
+    
+    # Returns (vertices, weights) of entries in group
+    def GroupVertices(self, group):
+        mask = self.groups == group
+        return (self.vertices[mask], self.weights[mask])
+    
+    # Returns weight of every vertex in group, default where vertex is not in group
+    def GroupWeights(self, group, default=np.nan):
+        out = np.full(self.numverts, default, dtype=np.float32)
+        vertices, weights = self.GroupVertices(group)
+        out[vertices] = weights
+        return out
+    
+    # Returns sum of weights for every vertex. Only entries in mask are counted if given
+    def VertexSums(self, mask=None):
+        if mask is None:
+            return np.bincount(self.vertices, weights=self.weights, minlength=self.numverts)
+        return np.bincount(self.vertices[mask], weights=self.weights[mask], minlength=self.numverts)
+    
+    # Returns number of entries for every vertex
+    def VertexCounts(self):
+        return np.diff(self.offsets)
+    
+    # Removes entries in mask from vertex groups with one remove() call per group
+    def Remove(self, vgroups, mask=None):
+        vertices = self.vertices if mask is None else self.vertices[mask]
+        groups = self.groups if mask is None else self.groups[mask]
+        order = np.argsort(groups, kind='stable')
+        values, starts = np.unique(groups[order], return_index=True)
+        
+        for g, indices in zip(values.tolist(), np.split(vertices[order], starts[1:])):
+            vgroups[g].remove(indices.tolist())
+        return len(vertices)
+    
+    # Writes weights of entries in mask to vertex groups with one add() call per group and weight
+    def Write(self, vgroups, mask=None):
+        vertices = self.vertices if mask is None else self.vertices[mask]
+        groups = self.groups if mask is None else self.groups[mask]
+        weights = self.weights if mask is None else self.weights[mask]
+        
+        order = np.argsort(groups, kind='stable')
+        values, starts = np.unique(groups[order], return_index=True)
+        
+        for g, indices in zip(values.tolist(), np.split(order, starts[1:])):
+            AddVertexWeights(vgroups[g], vertices[indices], weights[indices], 'REPLACE')
+        return len(vertices)
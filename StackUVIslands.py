@@ -1,63 +1,119 @@
 import bpy
+import numpy as np
 
 context = bpy.context
 
-def EvaluateIslands():
-    obj = context.object
+# Returns (n, 2) array of uv coordinates of layer
+def ReadUVs(uvlyr):
+    uvs = np.empty(len(uvlyr.data)*2, dtype=np.float32)
+    uvlyr.data.foreach_get('uv', uvs)
+    return uvs.reshape(-1, 2)
+
+# Returns root index of each element after joining element pairs in links
+def ConnectedComponents(count, links):
+    parents = np.arange(count, dtype=np.int64)
+    if len(links) == 0:
+        return parents
     
-    lastmode = obj.mode
-    bpy.ops.object.mode_set(mode='OBJECT')
+    a = links[:, 0].astype(np.int64)
+    b = links[:, 1].astype(np.int64)
     
-    uvlyr = obj.data.uv_layers.active
-    uvdata = tuple(uvlyr.data)
+    # Disjoint-set with hooking to lower root and pointer jumping
+    while True:
+        ra = parents[a]
+        rb = parents[b]
+        unjoined = ra != rb
+        if not unjoined.any():
+            break
+        ra = ra[unjoined]
+        rb = rb[unjoined]
+        np.minimum.at(parents, np.maximum(ra, rb), np.minimum(ra, rb))
+        
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
     
-    polygons = tuple([p for p in obj.data.polygons if p.select])
-    targetloops = tuple(set([l for p in obj.data.polygons if p.select for l in p.loop_indices]))
-    uvpool = tuple([uvdata[l] for l in targetloops])
+    return parents
+
+# Returns (loops, islands, count) of uv islands over polygons in mask. islands[i] is island index of loops[i].
+# Loops of the same vertex with uvs within tolerance of each other are connected
+def FindUVIslands(mesh, uvlyr, polygonmask=None, tolerance=1e-5):
+    numpolys = len(mesh.polygons)
+    loopstarts = np.empty(numpolys, dtype=np.int64)
+    looptotals = np.empty(numpolys, dtype=np.int64)
+    mesh.polygons.foreach_get('loop_start', loopstarts)
+    mesh.polygons.foreach_get('loop_total', looptotals)
+    loopverts = np.empty(len(mesh.loops), dtype=np.int64)
+    mesh.loops.foreach_get('vertex_index', loopverts)
     
-    def SharedUVs(p1, p2):
-        return sum([(uvdata[l1].uv == uvdata[l2].uv) for l1 in p1.loop_indices for l2 in p2.loop_indices]) > 0
+    polys = np.arange(numpolys) if polygonmask is None else np.flatnonzero(polygonmask)
+    totals = looptotals[polys]
+    loops = np.repeat(loopstarts[polys] - (np.cumsum(totals) - totals), totals) + np.arange(totals.sum())
+    looppolys = np.repeat(np.arange(len(polys)), totals)
     
-    nlast = -1
-    islands = [[p] for p in polygons]
+    if len(loops) == 0:
+        return (loops, looppolys, 0)
     
-    while nlast != len(islands):
-        nlast = len(islands)
-        
-        for is1 in islands:
-            for is2 in islands:
-                if is1 == is2:
-                    continue
-                
-                for p1 in is1:
-                    for p2 in is2:
-                        if SharedUVs(p1, p2):
-                            is1 += is2
-                            is2.clear()
-                            break
-        
-        for island in islands[::-1]:
-            if len(island) == 0:
-                islands.remove(island)
-        
-        print(len(islands))
+    # Compare each loop with the following loops of the same vertex in vertex order
+    order = np.argsort(loopverts[loops], kind='stable')
+    sortedverts = loopverts[loops][order]
+    sorteduvs = ReadUVs(uvlyr)[loops][order].astype(np.float64)
+    sortedpolys = looppolys[order]
     
-    uvislands = [ list(set(uvdata[l] for p in island for l in p.loop_indices)) for island in islands ]
+    links = [np.empty((0, 2), dtype=np.int64)]
+    k = 1
+    while k < len(order):
+        same = sortedverts[k:] == sortedverts[:-k]
+        if not same.any():
+            break
+        near = same & (((sorteduvs[k:] - sorteduvs[:-k])**2).sum(axis=1) <= tolerance*tolerance)
+        links.append(np.stack((sortedpolys[:-k][near], sortedpolys[k:][near]), axis=1))
+        k += 1
+    links = np.concatenate(links)
     
-    for island in uvislands:
-        center = obj.location.to_2d()
-        center.zero()
-        
-        for uv in island:
-            center += uv.uv
-        
-        center /= len(island)
-        
-        for uv in island:
-            uv.uv -= center
+    _, polyislands = np.unique(ConnectedComponents(len(polys), links), return_inverse=True)
+    polyislands = polyislands.ravel()
+    return (loops, polyislands[looppolys], int(polyislands.max())+1)
+
+# Returns (count, 2) array of island centers. 'CENTROID' averages loop uvs, 'BOUNDS' uses bounding box center
+def UVIslandCenters(uvs, islands, count, align='CENTROID'):
+    if align == 'BOUNDS':
+        lo = np.full((count, 2), np.inf)
+        hi = np.full((count, 2), -np.inf)
+        np.minimum.at(lo, islands, uvs)
+        np.maximum.at(hi, islands, uvs)
+        return (lo + hi) * 0.5
+    
+    sums = np.stack([np.bincount(islands, weights=uvs[:, c], minlength=count) for c in range(2)], axis=1)
+    return sums / np.maximum(np.bincount(islands, minlength=count), 1)[:, None]
+
+# Moves islands of uvs so that island centers meet at target. uvs is modified in place
+def AlignUVIslands(uvs, loops, islands, count, target=(0.0, 0.0), align='CENTROID'):
+    centers = UVIslandCenters(uvs[loops], islands, count, align)
+    uvs[loops] += (np.asarray(target, dtype=np.float64) - centers)[islands].astype(uvs.dtype)
+    return uvs
+
+def EvaluateIslands(align='CENTROID', tolerance=1e-5):
+    obj = context.object
+    
+    lastmode = obj.mode
+    bpy.ops.object.mode_set(mode='OBJECT')
+    
+    mesh = obj.data
+    uvlyr = mesh.uv_layers.active
+    
+    select = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get('select', select)
+    
+    loops, islands, count = FindUVIslands(mesh, uvlyr, select, tolerance)
+    print(count)
+    
+    uvs = ReadUVs(uvlyr)
+    AlignUVIslands(uvs, loops, islands, count, (0.0, 0.0), align)
+    uvlyr.data.foreach_set('uv', uvs.ravel())
     
     bpy.ops.object.mode_set(mode=lastmode)
     
 EvaluateIslands()
-
-
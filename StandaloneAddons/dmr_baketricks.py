@@ -17,6 +17,7 @@ bl_info = {
 
 import bpy
 import json
+import numpy as np
 from bpy_extras.io_utils import ImportHelper, ExportHelper
 
 classlist = []
@@ -88,6 +89,35 @@ def ObjectRenderEnabled(obj, op=None):
 
 # ----------------------------------------------------------------------------
 
+# Returns image pixels as (pixel count, channels) float32 array
+def ImageToArray(image):
+    pixels = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels.reshape(-1, image.channels)
+
+# Writes sources[i] to channel i of image. Source is an image (read from channel readchannel[i]),
+# a constant float value, or None to keep the image's current channel
+def ComposeFrom4(image, sources, readchannel):
+    out = np.empty((image.size[0]*image.size[1], image.channels), dtype=np.float32)
+    srcdata = {}
+    
+    for i in range(min(4, image.channels)):
+        src = sources[i]
+        if src == None:
+            if image.name not in srcdata:
+                srcdata[image.name] = ImageToArray(image)
+            out[:, i] = srcdata[image.name][:, i]
+        elif isinstance(src, (int, float)):
+            out[:, i] = src
+        else:
+            if src.name not in srcdata:
+                srcdata[src.name] = ImageToArray(src)
+            out[:, i] = srcdata[src.name][:, readchannel[i]]
+    
+    image.pixels.foreach_set(out.ravel())
+
+# ----------------------------------------------------------------------------
+
 def ImageFrom4(
     op, context, 
     output1, output2, output3, output4, 
@@ -175,12 +205,7 @@ def ImageFrom4(
                 # Use Default Value
                 if name == "":
                     print('> "%s", value = %.2f' % (name, values[channelindex]))
-                    bakeimage = bpy.data.images.new("__temp_bake%d_%s" % (channelindex, name), 
-                        int(targetimage.size[0]), int(targetimage.size[1]), alpha=True, is_data=True)
-                    bakeimages.append(bakeimage)
-                    bakeimage.colorspace_settings.name = color_space
-                    
-                    bakeimage.pixels = tuple([values[channelindex]] * len(bakeimage.pixels))
+                    bakeimages.append(float(values[channelindex]))
                     continue
                 
                 bakekey = str((name, types[channelindex]))
@@ -246,17 +271,7 @@ def ImageFrom4(
                 # List of channels indices[4]
                 readchannel = tuple([{'R':0, 'G':1, 'B':2, 'A':3}[channels[i]] for i in range(0, 4)])
                 
-                pixels = targetimage.pixels
-                w, h = targetimage.size
-                n = w*h
-                n4 = n*4
-                
-                sourcedata = tuple([tuple(bakeimages[i].pixels) for i in range(0, 4)])
-                
-                targetimage.pixels = tuple(
-                    sourcedata[ pi%4 ][ 4*(pi//4)+readchannel[pi%4] ]
-                    for pi in range(0, n4)
-                )
+                ComposeFrom4(targetimage, bakeimages, readchannel)
                 
                 targetimage.scale(int(targetimage.size[0]/bakeres), int(targetimage.size[1]/bakeres))
                 
@@ -9,105 +9,387 @@ bl_info = {
 }
 
 import bpy
+import mathutils.kdtree
+import numpy as np
 
 classlist = []
 
 # ==========================================================================================================
 
-# Returns array of islands of vertices per separated parts of mesh
-def FindMeshIslands(mesh):
-    Sqr = lambda x: x*x
-    Abs = lambda x: x if x >= 0 else -x
+# Returns (n, 3) array of vertex coordinates
+def MeshVertexCoords(mesh):
+    co = np.empty(len(mesh.vertices)*3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    return co.reshape(-1, 3)
+
+# Returns (n, 2) array of vertex index pairs joining each polygon's vertices
+def MeshPolygonLinks(mesh):
+    loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+    loopstarts = np.empty(len(mesh.polygons), dtype=np.int32)
+    looptotals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loopverts)
+    mesh.polygons.foreach_get('loop_start', loopstarts)
+    mesh.polygons.foreach_get('loop_total', looptotals)
+    
+    # Link every corner to the first corner of its polygon
+    firstverts = np.repeat(loopverts[loopstarts], looptotals)
+    return np.stack((firstverts, loopverts), axis=1)
+
+# Returns component label per vertex. Label is the lowest vertex index of the component
+def ConnectedComponents(count, links):
+    parents = np.arange(count, dtype=np.int64)
+    if len(links) == 0:
+        return parents
+    
+    a = links[:, 0].astype(np.int64)
+    b = links[:, 1].astype(np.int64)
+    
+    # Disjoint-set with hooking to lower root and pointer jumping
+    while True:
+        ra = parents[a]
+        rb = parents[b]
+        unjoined = ra != rb
+        if not unjoined.any():
+            break
+        ra = ra[unjoined]
+        rb = rb[unjoined]
+        np.minimum.at(parents, np.maximum(ra, rb), np.minimum(ra, rb))
+        
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
     
+    return parents
+
+# Returns array of islands of vertex indices per separated parts of mesh
+def FindMeshIslands(mesh):
     mode = bpy.context.object.mode
     bpy.ops.object.mode_set(mode='OBJECT')
     
-    vertices = tuple(mesh.vertices)
-    vertexindices = tuple([v.index for v in vertices])
-    edges = tuple(mesh.edges)
-    polygons = tuple(mesh.polygons)
+    coords = MeshVertexCoords(mesh)
+    labels = ConnectedComponents(len(coords), MeshPolygonLinks(mesh))
     
-    # Find Islands
-    islands = []
-    targetverts = [v.index for v in vertices]
-    
-    vertexshapelist = polygons
-    
-    while len(targetverts) > 0:
-        island = [targetverts[0]]
-        nlast = 0
-        
-        while nlast != len(island):
-            nlast = len(island)
-            island += [
-                vi 
-                for p in vertexshapelist if sum([1 for vi in p.vertices if vi in island]) 
-                for vi in p.vertices if vi not in island
-                ]
-        
-        island.sort(key=lambda vi: -(vertices[vi].co[0]) )
-        islands.append(tuple(island))
-        
-        targetverts = [
-            vi for vi in vertexindices 
-            if vi not in [vi for isl in islands for vi in isl]
-            ]
-        
-        if len(targetverts) == 0:
-            break
-        
-        #print(len(island), len(targetverts))
-    
-    print("> %d Islands Found" % len(islands))
+    # Group vertices by label, ordered by lowest vertex index of island
+    order = np.argsort(labels, kind='stable')
+    _, counts = np.unique(labels[order], return_counts=True)
+    islands = np.split(order, np.cumsum(counts)[:-1]) if len(order) else []
     
     islands = [
-        tuple([vertices[vi] for vi in island])
+        island[np.argsort(-coords[island, 0], kind='stable')]
         for island in islands
     ]
     
-    islands.sort(key=lambda x: Abs(sum([v.co[0] for v in x])) )
+    print("> %d Islands Found" % len(islands))
+    
+    islands.sort(key=lambda x: abs(coords[x, 0].sum(dtype=np.float64)) )
     
     bpy.ops.object.mode_set(mode=mode)
     
     return islands
 
+# ==========================================================================================================
+# MIRROR MAPS
+# ==========================================================================================================
+
+MIRRORSCALE = np.array((-1.0, 1.0, 1.0), dtype=np.float32)
+MIRRORTHRESHOLD = 0.01
+
+# Returns kd-tree of (n, 3) points
+def BuildKDTree(points):
+    kd = mathutils.kdtree.KDTree(len(points))
+    for i, co in enumerate(points.tolist()):
+        kd.insert(co, i)
+    kd.balance()
+    return kd
+
+# Returns index of nearest tree point to each point. -1 if none within threshold
+def FindNearestIndices(kd, points, threshold, filter=None):
+    result = np.full(len(points), -1, dtype=np.int32)
+    
+    for i, co in enumerate(points.tolist()):
+        if filter:
+            hitco, index, dist = kd.find(co, filter=filter)
+        else:
+            hitco, index, dist = kd.find(co)
+        if index is not None and dist <= threshold:
+            result[i] = index
+    return result
+
+# Returns index of nearest tree point to the x-mirrored position of each point. -1 if none within threshold
+def FindMirrorIndices(kd, points, threshold, filter=None):
+    return FindNearestIndices(kd, points * MIRRORSCALE, threshold, filter)
+
+# Returns concatenated loop indices of polygons
+def PolygonLoopIndices(loopstarts, looptotals):
+    offsets = np.arange(looptotals.sum()) - np.repeat(np.cumsum(looptotals) - looptotals, looptotals)
+    return np.repeat(loopstarts, looptotals) + offsets
+
+# Returns (n, width) array of attribute values of layer data
+def ReadDataValues(data, attribute, width):
+    values = np.empty(len(data)*width, dtype=np.float32)
+    data.foreach_get(attribute, values)
+    return values.reshape(-1, width)
+
+# Copies attribute values from source elements to target elements of layer data
+def CopyDataValues(data, attribute, width, sources, targets):
+    values = ReadDataValues(data, attribute, width)
+    values[targets] = values[sources]
+    data.foreach_set(attribute, values.ravel())
+
+# Returns mesh arrays used for mirror maps. Must be called in Object mode
+def ReadMirrorMeshArrays(mesh):
+    coords = MeshVertexCoords(mesh)
+    edgeverts = np.empty(len(mesh.edges)*2, dtype=np.int32)
+    loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+    loopstarts = np.empty(len(mesh.polygons), dtype=np.int32)
+    looptotals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.edges.foreach_get('vertices', edgeverts)
+    mesh.loops.foreach_get('vertex_index', loopverts)
+    mesh.polygons.foreach_get('loop_start', loopstarts)
+    mesh.polygons.foreach_get('loop_total', looptotals)
+    return (coords, edgeverts.reshape(-1, 2), loopverts, loopstarts, looptotals)
+
+# Returns value that changes when topology or vertex positions change
+def MirrorMeshSignature(arrays):
+    return tuple((len(a), hash(a.tobytes())) for a in arrays)
+
+class MirrorMap:
+    """Vertex, edge, polygon and loop correspondences across the X axis for one mesh.
+    Maps are integer arrays of mirrored element index per element, -1 where no mirror is within threshold.
+    """
+    def __init__(self, arrays):
+        self.coords, self.edgeverts, self.loopverts, self.loopstarts, self.looptotals = arrays
+        self.signature = MirrorMeshSignature(arrays)
+        self.points = {}    # {kind: (points, kdtree)}
+        self.maps = {}  # {(kind, threshold): indices}
+    
+    # Returns (points, kdtree) for 'VERTEX', 'EDGE' or 'POLYGON'
+    def Points(self, kind):
+        if kind not in self.points:
+            if kind == 'VERTEX':
+                points = self.coords
+            elif kind == 'EDGE':
+                points = self.coords[self.edgeverts].mean(axis=1)
+            elif kind == 'POLYGON':
+                points = self.PolygonCenters()
+            else:
+                raise ValueError("Unknown mirror map kind \"%s\"" % kind)
+            self.points[kind] = (points, BuildKDTree(points))
+        return self.points[kind]
+    
+    # Returns (n, 3) array of polygon median centers
+    def PolygonCenters(self):
+        if len(self.loopstarts) == 0:
+            return np.empty((0, 3), dtype=np.float32)
+        loopco = self.coords[self.loopverts].astype(np.float64)
+        return (np.add.reduceat(loopco, self.loopstarts, axis=0) / self.looptotals[:, None]).astype(np.float32)
+    
+    # Returns mirrored element index per element of kind
+    def Map(self, kind, threshold=MIRRORTHRESHOLD):
+        key = (kind, threshold)
+        if key not in self.maps:
+            points, kd = self.Points(kind)
+            self.maps[key] = FindMirrorIndices(kd, points, threshold)
+        return self.maps[key]
+    
+    # Returns (sources, targets) index arrays pairing sources with the nearest mirrored element where targetmask is True
+    def MatchPairs(self, kind, sources, targetmask, threshold=MIRRORTHRESHOLD):
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = self.Map(kind, threshold)[sources]
+        
+        # Cached mirror is usable when it is a valid target. Otherwise search only valid targets
+        valid = targets >= 0
+        valid[valid] = targetmask[targets[valid]]
+        if not valid.all():
+            points, kd = self.Points(kind)
+            targetlist = targetmask.tolist()
+            targets[~valid] = FindMirrorIndices(kd, points[sources[~valid]], threshold, filter=targetlist.__getitem__)
+        
+        hit = targets >= 0
+        return (sources[hit], targets[hit])
+    
+    # Returns mirrored loop index per loop. Loops are matched inside mirrored polygons
+    def LoopMap(self, threshold=MIRRORTHRESHOLD):
+        key = ('LOOP', threshold)
+        if key not in self.maps:
+            loopmap = np.full(len(self.loopverts), -1, dtype=np.int32)
+            polymap = self.Map('POLYGON', threshold)
+            
+            polys1 = np.flatnonzero(polymap >= 0)
+            polys2 = polymap[polys1]
+            pairtotals = np.stack((self.looptotals[polys1], self.looptotals[polys2]), axis=1)
+            
+            # Batch polygon pairs with same corner counts
+            for total1, total2 in np.unique(pairtotals, axis=0).tolist():
+                batch = (pairtotals[:, 0] == total1) & (pairtotals[:, 1] == total2)
+                loops1 = self.loopstarts[polys1[batch]][:, None] + np.arange(total1)
+                loops2 = self.loopstarts[polys2[batch]][:, None] + np.arange(total2)
+                co1 = self.coords[self.loopverts[loops1]] * MIRRORSCALE
+                co2 = self.coords[self.loopverts[loops2]]
+                
+                dist = ((co1[:, :, None, :] - co2[:, None, :, :])**2).sum(axis=3)
+                nearest = dist.argmin(axis=2)
+                hit = np.take_along_axis(dist, nearest[:, :, None], axis=2)[:, :, 0] <= threshold*threshold
+                loopmap[loops1[hit]] = np.take_along_axis(loops2, nearest, axis=1)[hit]
+            
+            self.maps[key] = loopmap
+        return self.maps[key]
+
+MIRRORMAPS = {}   # {mesh.session_uid: MirrorMap}, least recently used first
+MIRRORMAPLIMIT = 8
+
+# Returns cached mirror map for mesh, rebuilding if mesh has changed. Must be called in Object mode
+def GetMirrorMap(mesh):
+    arrays = ReadMirrorMeshArrays(mesh)
+    mirrormap = MIRRORMAPS.pop(mesh.session_uid, None)
+    
+    if mirrormap is None or mirrormap.signature != MirrorMeshSignature(arrays):
+        mirrormap = MirrorMap(arrays)
+    MIRRORMAPS[mesh.session_uid] = mirrormap
+    
+    # Drop least recently used maps
+    while len(MIRRORMAPS) > MIRRORMAPLIMIT:
+        del MIRRORMAPS[next(iter(MIRRORMAPS))]
+    return mirrormap
+
+# Session uids are reused by the next file
+@bpy.app.handlers.persistent
+def MirrorMapsLoadPost(*args):
+    MIRRORMAPS.clear()
+
+# Moves target vertices to mirrored positions of source vertices. Returns number of vertices changed
+def MirrorVertexPositions(mesh, mirrormap, sources, targets):
+    coords = mirrormap.coords.copy()
+    mirrored = coords[sources] * MIRRORSCALE
+    changed = (coords[targets] != mirrored).any(axis=1)
+    
+    if changed.any():
+        coords[targets[changed]] = mirrored[changed]
+        mesh.vertices.foreach_set('co', coords.ravel())
+        mesh.update()
+    return int(np.count_nonzero(changed))
+
 # ----------------------------------------------------------------------------------------------------------
 
 # Returns ( islandspairs[], islandsisolated[] )
 def FindMirroredIslands(mesh, islands, separate_threshold=0.1):
-    Sqr = lambda x: x*x
-    Abs = lambda x: x if x >= 0 else -x
+    coords = MeshVertexCoords(mesh)
+    sums = np.array([coords[island].sum(axis=0, dtype=np.float64) for island in islands]).reshape(-1, 3)
     
     # Find Mirrored Island Pairs
-    usedislands = []
+    kd = BuildKDTree(sums)
+    threshold = separate_threshold ** 0.5
+    usedislands = [False] * len(islands)
     islandpairs = []
     
-    for i1 in islands:
-        if i1 in usedislands:
+    for i1 in range(len(islands)):
+        if usedislands[i1]:
             continue
         
-        for i2 in islands[::-1]:
-            if i2 in usedislands:
-                continue
-            if i1 == i2:
-                continue
-            
-            if (
-                Sqr( sum([v.co[0] for v in i1])+sum([v.co[0] for v in i2]) ) +
-                Sqr( sum([v.co[1] for v in i1])-sum([v.co[1] for v in i2]) ) +
-                Sqr( sum([v.co[2] for v in i1])-sum([v.co[2] for v in i2]) )
-                ) <= separate_threshold:
-                islandpairs.append((i1, i2))
-                usedislands.append(i1)
-                usedislands.append(i2)
-                break
+        i2 = FindMirrorIndices(kd, sums[i1:i1+1], threshold, 
+            filter=lambda i: not usedislands[i] and i != i1)[0]
+        
+        if i2 >= 0:
+            islandpairs.append((islands[i1], islands[i2]))
+            usedislands[i1] = True
+            usedislands[i2] = True
     
     islandsolos = [
-        isl for isl in islands if not sum([1 for pair in islandpairs if isl in pair])
+        isl for i, isl in enumerate(islands) if not usedislands[i]
     ]
     
     return (islandpairs, islandsolos)
 
+# ==========================================================================================================
+# MIRROR WEIGHTS
+# ==========================================================================================================
+
+MIRRORSIDES = {k: v for k,v in zip('LRlr', 'RLrl')}
+
+# Returns group name without numbered suffix (".001")
+def GroupBaseName(name):
+    if len(name) > 4 and name[-4] in '-._' and name[-3:].isdigit():
+        return name[:-4]
+    return name
+
+# Returns unsuffixed group name if group is an unlocked sided group ("arm.L", "arm.L.001"). None otherwise
+def SidedGroupBaseName(vg):
+    base = GroupBaseName(vg.name)
+    if not vg.lock_weight and len(base) > 1 and base[-2] in '-._' and base[-1] in MIRRORSIDES:
+        return base
+    return None
+
+# Returns mirror group index per vertex group index. -1 for groups without an unlocked mirror.
+# An exact name owns its base name over numbered duplicates. Numbered duplicates only stand in
+# for a missing base when they are the only one
+def MirrorGroupTable(vgroups):
+    sidedgroups = {}    # {basename: index}. None when base name is ambiguous
+    exactnames = set()
+    for vg in vgroups:
+        base = SidedGroupBaseName(vg)
+        if base is None:
+            continue
+        if base == vg.name:
+            sidedgroups[base] = vg.index
+            exactnames.add(base)
+        elif base not in exactnames:
+            sidedgroups[base] = None if base in sidedgroups else vg.index
+    
+    table = np.full(len(vgroups), -1, dtype=np.int32)
+    for vg in vgroups:
+        base = SidedGroupBaseName(vg)
+        if base is not None and sidedgroups.get(base) == vg.index:
+            mirror = sidedgroups.get(base[:-1] + MIRRORSIDES[base[-1]])
+            table[vg.index] = -1 if mirror is None else mirror
+    return table
+
+# Returns (rows, groups, weights) arrays of all weights of given vertices. Rows index into vertexindices
+def ReadWeightTable(vertices, vertexindices):
+    entries = [
+        (row, vge.group, vge.weight)
+        for row, vi in enumerate(vertexindices)
+        for vge in vertices[vi].groups
+    ]
+    if not entries:
+        return (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+    rows, groups, weights = zip(*entries)
+    return (np.array(rows, dtype=np.int32), np.array(groups, dtype=np.int32), np.array(weights, dtype=np.float32))
+
+# Copies weights of source vertices to target vertices, swapping mirrored groups. Returns number of vertices written
+def SyncMirrorWeights(obj, sources, targets):
+    vgroups = obj.vertex_groups
+    if len(sources) == 0 or len(vgroups) == 0:
+        return 0
+    
+    rows, groups, weights = ReadWeightTable(obj.data.vertices, sources.tolist())
+    mirrorgroups = MirrorGroupTable(vgroups)[groups]
+    rowtargets = targets[rows]
+    destgroups = np.where(mirrorgroups >= 0, mirrorgroups, groups)
+    
+    # Last source wins where vertices share a target
+    keys = rowtargets.astype(np.int64) * len(vgroups) + destgroups
+    _, last = np.unique(keys[::-1], return_index=True)
+    keep = np.sort(len(keys) - 1 - last)
+    
+    # Clear target from mirrored source groups before writing
+    removes = np.unique(np.stack((groups, rowtargets), axis=1)[keep][mirrorgroups[keep] >= 0], axis=0)
+    for g in np.unique(removes[:, 0]).tolist():
+        vgroups[g].remove(removes[removes[:, 0] == g, 1].tolist())
+    
+    # One add per group and weight
+    adds = np.stack((destgroups[keep], weights[keep].view(np.int32)), axis=1)
+    adds, inverse = np.unique(adds, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind='stable')
+    splits = np.cumsum(np.bincount(inverse, minlength=len(adds)))[:-1]
+    
+    for (g, w), indices in zip(adds.tolist(), np.split(rowtargets[keep][order], splits)):
+        vgroups[g].add(indices.tolist(), float(np.int32(w).view(np.float32)), 'REPLACE')
+    
+    return len(sources)
+
 # ==========================================================================================================
 # SUPER SYMMETRIZE
 # ==========================================================================================================
@@ -160,8 +442,6 @@ class DMR_OT_SuperSymmetrize(bpy.types.Operator):
         vertexindices = tuple([v.index for v in vertices])
         edges = tuple(obj.data.edges)
         polygons = tuple(obj.data.polygons)
-        loops = tuple(obj.data.loops)
-        selectedpolys = [polygons[i] for i in selectedpolyindices]
         
         # Find islands
         if self.high_accuracy:
@@ -172,93 +452,93 @@ class DMR_OT_SuperSymmetrize(bpy.types.Operator):
             print("> %d Solo Islands" % len(islandsolos))
         # All one island
         else:
-            islands = [[v for v in vertices]]
+            islands = [np.arange(len(vertices))]
             islandpairs = []
             islandsolos = islands
         
         # Process Islands -----------------------------------------------------------------------------------
         
+        coords = MeshVertexCoords(obj.data)
+        edgeverts = np.empty(len(edges)*2, dtype=np.int32)
+        obj.data.edges.foreach_get('vertices', edgeverts)
+        edgeverts = edgeverts.reshape(-1, 2)
+        
+        selectmask = np.zeros(len(vertices), dtype=bool)
+        
         # Select Sides of Solo Islands
         for island in islandsolos:
-            centerindices = [v.index for v in island if Sqr(v.co[0]) <= Sqr(self.center_threshold)]
-            islandpolys = [p for p in edges if sum(1 for vi in p.vertices if vertices[vi] in island)]
-            islandpolys.sort(key=lambda p: -(sum([vertices[vi].co[0] for vi in p.vertices])) )
-            
-            islandside = [ island[0].index ]
-            nlast = 0
-            while nlast != len(islandside):
-                nlast = len(islandside)
-                islandside += [
-                    vi
-                    for p in islandpolys if (
-                        sum([1 for vi in p.vertices if vi in islandside]) and 
-                        not sum([1 for vi in p.vertices if vi in centerindices])
-                        )
-                    for vi in p.vertices if vi not in islandside
-                    ]
+            if len(island) == 0:
+                continue
             
-            for vi in islandside+centerindices:
-                vertices[vi].select = True
+            iscenter = np.zeros(len(vertices), dtype=bool)
+            iscenter[island] = coords[island, 0]**2 <= Sqr(self.center_threshold)
+            inisland = np.zeros(len(vertices), dtype=bool)
+            inisland[island] = True
+            
+            # Grow side from first vertex without crossing center vertices
+            sideedges = edgeverts[
+                inisland[edgeverts].any(axis=1) & 
+                ~iscenter[edgeverts].any(axis=1)
+                ]
+            labels = ConnectedComponents(len(vertices), sideedges)
+            
+            selectmask |= (labels == labels[island[0]]) | iscenter
         
         # Select Left Mirrored Islands
         for islandL, islandR in islandpairs:
-            for v in islandL:
-                v.select = True
-        
-        targetpolys = [p for p in polygons if sum(vertices[vi].select for vi in p.vertices) == len(p.vertices) and p in selectedpolys]
-        polypairs = [
-            (p1, p2)
-            for p1 in targetpolys
-            for p2 in polygons if p1 != p2 and (
-                Sqr( p1.center[0]+p2.center[0] ) +
-                Sqr( p1.center[1]-p2.center[1] ) +
-                Sqr( p1.center[2]-p2.center[2] )
-            ) <= Sqr(self.separate_threshold)
-        ]
+            selectmask[islandL] = True
+        
+        obj.data.vertices.foreach_set('select', selectmask)
         
         # Match Loops
         match_uvs = self.uvs
         match_colors = self.colors
         
         if match_uvs or match_colors:
-            uv_layer = obj.data.uv_layers.active
-            vc_layer = obj.data.color_attributes.active
-            #vgroups = obj.data.vgroups
+            mirrormap = GetMirrorMap(obj.data)
+            loopverts = mirrormap.loopverts
+            looptotals = mirrormap.looptotals
             
-            for p1, p2 in polypairs:
-                loops1 = [loops[l] for l in p1.loop_indices]
-                loops2 = [loops[l] for l in p2.loop_indices]
-                loops1.sort( key=lambda l: vertices[l.vertex_index].co.magnitude )
-                loops2.sort( key=lambda l: vertices[l.vertex_index].co.magnitude )
-                
-                for l1, l2 in zip(loops1, loops2):
-                    if match_uvs:
-                        uv_layer.data[l2.index].uv = uv_layer.data[l1.index].uv
-                    if match_colors:
-                        vc_layer.data[l2.index].color = vc_layer.data[l1.index].color
+            # Source polygons were selected and have all vertices on selected side
+            targetpolys = np.zeros(len(polygons), dtype=bool)
+            targetpolys[selectedpolyindices] = True
+            if len(polygons):
+                targetpolys &= np.logical_and.reduceat(selectmask[loopverts], mirrormap.loopstarts)
+            targetpolys &= mirrormap.Map('POLYGON', self.separate_threshold) != np.arange(len(polygons))
             
+            loopmap = mirrormap.LoopMap(self.separate_threshold)
+            sources = np.flatnonzero(np.repeat(targetpolys, looptotals) & (loopmap >= 0))
+            targets = loopmap[sources]
+            
+            uv_layer = obj.data.uv_layers.active
+            vc_layer = obj.data.color_attributes.active
             
+            if match_uvs and uv_layer:
+                CopyDataValues(uv_layer.data, 'uv', 2, sources, targets)
+            if match_colors and vc_layer:
+                if vc_layer.domain == 'POINT':
+                    CopyDataValues(vc_layer.data, 'color', 4, loopverts[sources], loopverts[targets])
+                else:
+                    CopyDataValues(vc_layer.data, 'color', 4, sources, targets)
+        
         # Store loop state
+        lastmap = None
         lastuvs = {}
         lastcolors = {}
         
         if self.use_modifier and self.apply_modifier:
+            lastmap = GetMirrorMap(obj.data)
+            
             if not match_uvs:
                 lastuvs = {
-                    p.center.copy().freeze(): tuple( [
-                        tuple( [lyr.data[l].uv.copy() for lyrindex, lyr in enumerate(obj.data.uv_layers)] )
-                        for l in p.loop_indices
-                    ] )
-                    for p in polygons
+                    lyr.name: ReadDataValues(lyr.data, 'uv', 2)
+                    for lyr in obj.data.uv_layers
                 }
             
             if not match_colors:
                 lastcolors = {
-                    p.center.copy().freeze(): tuple( [
-                        tuple( [tuple(lyr.data[l].color) for lyrindex, lyr in enumerate(obj.data.color_attributes)] )
-                        for l in p.loop_indices
-                    ] )
-                    for p in polygons
+                    lyr.name: ReadDataValues(lyr.data, 'color', 4)
+                    for lyr in obj.data.color_attributes if lyr.domain == 'CORNER'
                 }
         
         # Use Mirror
@@ -290,31 +570,33 @@ class DMR_OT_SuperSymmetrize(bpy.types.Operator):
             if m:
                 bpy.ops.object.modifier_apply(modifier=m.name)
             
-            # Restore UVs
-            if lastuvs:
-                for p in tuple(obj.data.polygons):
-                    rankedlastpolys = list(lastuvs.keys())
-                    rankedlastpolys.sort(key = lambda k: (p.center-k).length)
-                    
-                    if (p.center-rankedlastpolys[0]).length <= 0.001:
-                        last = lastuvs[rankedlastpolys[0]]
-                        
-                        for li, l in enumerate(p.loop_indices):
-                            for lyrindex, lyr in enumerate(obj.data.uv_layers):
-                                lyr.data[l].uv = last[li][lyrindex]
-            
-            # Restore Colors
-            if lastcolors:
-                for p in tuple(obj.data.polygons):
-                    rankedlastpolys = list(lastcolors.keys())
-                    rankedlastpolys.sort(key = lambda k: (p.center-k).length)
-                    
-                    if (p.center-rankedlastpolys[0]).length <= 0.001:
-                        last = lastcolors[rankedlastpolys[0]]
-                        
-                        for li, l in enumerate(p.loop_indices):
-                            for lyrindex, lyr in enumerate(obj.data.color_attributes):
-                                lyr.data[l].color = last[li][lyrindex]
+            # Restore loop data from polygons at same positions before split
+            if lastuvs or lastcolors:
+                newmap = GetMirrorMap(obj.data)
+                lastcenters, lasttree = lastmap.Points('POLYGON')
+                
+                lastpolys = FindNearestIndices(lasttree, newmap.Points('POLYGON')[0], 0.001)
+                newpolys = np.flatnonzero(lastpolys >= 0)
+                lastpolys = lastpolys[newpolys]
+                
+                sametotal = newmap.looptotals[newpolys] == lastmap.looptotals[lastpolys]
+                newpolys = newpolys[sametotal]
+                lastpolys = lastpolys[sametotal]
+                
+                newloops = PolygonLoopIndices(newmap.loopstarts[newpolys], newmap.looptotals[newpolys])
+                lastloops = PolygonLoopIndices(lastmap.loopstarts[lastpolys], lastmap.looptotals[lastpolys])
+                
+                for lyr in obj.data.uv_layers:
+                    if lyr.name in lastuvs:
+                        uvs = ReadDataValues(lyr.data, 'uv', 2)
+                        uvs[newloops] = lastuvs[lyr.name][lastloops]
+                        lyr.data.foreach_set('uv', uvs.ravel())
+                
+                for lyr in obj.data.color_attributes:
+                    if lyr.name in lastcolors and lyr.domain == 'CORNER':
+                        colors = ReadDataValues(lyr.data, 'color', 4)
+                        colors[newloops] = lastcolors[lyr.name][lastloops]
+                        lyr.data.foreach_set('color', colors.ravel())
         
         bpy.ops.object.mode_set(mode='EDIT')
         
@@ -348,93 +630,35 @@ class DMR_OT_SuperSynchronize(bpy.types.Operator):
     def execute(self, context):
         bpy.ops.object.mode_set(mode='OBJECT')
         
-        negxvec = bpy.data.objects[0].location.copy()
-        negxvec[:] = (-1,1,1)
-        
         vertexhits = 0
         weighthits = 0
         
         for obj in [obj for obj in context.selected_objects if obj.type == 'MESH']:
             mesh = obj.data
-            vertices = tuple(mesh.vertices)
             edges = tuple(mesh.edges)
+            mirrormap = GetMirrorMap(mesh)
             
-            selectedverts = [v for v in vertices if v.select]
-            nonselectedverts = [v for v in vertices if not v.select]
-            vertexpairs = []
-            
-            selectededges = [e for e in edges if e.select]
-            nonselectededges = [e for e in edges if not e.select]
-            edgepairs = []
+            selectmask = np.empty(len(mesh.vertices), dtype=bool)
+            mesh.vertices.foreach_get('select', selectmask)
+            edgeselectmask = np.empty(len(edges), dtype=bool)
+            mesh.edges.foreach_get('select', edgeselectmask)
             
             # Find Vertex Pairs
-            for v1 in selectedverts:
-                candidates = nonselectedverts[:]
-                candidates.sort(key=lambda v2: (v2.co-(v1.co*negxvec)).length)
-                v2 = candidates[0]
-                
-                if (v2.co-(v1.co*negxvec)).length <= 0.01:
-                    vertexpairs.append((v1, v2))
+            vertexsources, vertextargets = mirrormap.MatchPairs('VERTEX', np.flatnonzero(selectmask), ~selectmask)
             
             # Find Edge Pairs
-            def EdgeCo(e):
-                return (vertices[e.vertices[0]].co + vertices[e.vertices[1]].co) / 2.0
-            
-            for e1 in selectededges:
-                candidates = nonselectededges[:]
-                candidates.sort(key=lambda e2: (EdgeCo(e2)-(EdgeCo(e1)*negxvec)).length)
-                e2 = candidates[0]
-                
-                if (EdgeCo(e2)-(EdgeCo(e1)*negxvec)).length <= 0.01:
-                    edgepairs.append((e1, e2))
-            
-            # Find Group Pairs
-            vgrouppairs = []
-            if self.weights:
-                vgroups = obj.vertex_groups
-                BaseName = lambda x: x[:-4] if ( len(x) > 4 and sum(1 for c in x[:-3] if c in '0123456789')==3 and x[-4] in '-._' ) else x
-                vgrouppairs = {
-                    vg1: vg2
-                    for vg1 in vgroups if (
-                        not vg1.lock_weight and
-                        BaseName(vg1.name)[-2] in '-._' and 
-                        BaseName(vg1.name)[-1] in 'LRlr' 
-                    )
-                    for vg2 in vgroups if (
-                        not vg2.lock_weight and
-                        BaseName(vg2.name)[-2] in '-._' and
-                        BaseName(vg2.name)[-1] == {k:v for k,v in zip('LRlr', 'RLrl')}[BaseName(vg1.name)[-1]] and
-                        BaseName(vg2.name)[:-1] == BaseName(vg1.name)[:-1]
-                    )
-                }
+            edgesources, edgetargets = mirrormap.MatchPairs('EDGE', np.flatnonzero(edgeselectmask), ~edgeselectmask)
+            edgepairs = [(edges[i1], edges[i2]) for i1, i2 in zip(edgesources.tolist(), edgetargets.tolist())]
             
             # Synchronize ---------------------------------------------------
             
             # Positions
             if self.vertices:
-                for v1, v2 in vertexpairs:
-                    if v2.co != v1.co*negxvec:
-                        v2.co[:] = v1.co*negxvec
-                        vertexhits += 1
+                vertexhits += MirrorVertexPositions(mesh, mirrormap, vertexsources, vertextargets)
                 
             # Weights
             if self.weights:
-                for v1, v2 in vertexpairs:
-                    #[vg2.remove([v2.index]) for vg2 in [vgroups[vge2.group] for vge2 in v2.groups] if not vg2.lock_weight]
-                    
-                    for vge1 in v1.groups:
-                        vg1 = vgroups[vge1.group]
-                        
-                        # Mirror Group
-                        if vg1 in vgrouppairs.keys():
-                            vg2 = vgrouppairs[vg1]
-                            vg1.remove([v2.index])
-                            vg2.add([v2.index], vge1.weight, 'REPLACE')
-                        # Non-Mirror Group
-                        else:
-                            vg1.add([v2.index], vge1.weight, 'REPLACE')
-                    
-                    weighthits += 1
+                weighthits += SyncMirrorWeights(obj, vertexsources, vertextargets)
             
             # Creases
             if self.creases:
@@ -475,30 +699,16 @@ class DMR_OT_MatchMirrorVertices(bpy.types.Operator):
     def execute(self, context):
         bpy.ops.object.mode_set(mode='OBJECT')
         
-        negxvec = bpy.data.objects[0].location.copy()
-        negxvec[:] = (-1,1,1)
-        
         hits = 0
         
         for mesh in [obj.data for obj in context.selected_objects if obj.type == 'MESH']:
-            vertices = tuple(mesh.vertices)
+            mirrormap = GetMirrorMap(mesh)
             
-            selectedverts = [v for v in vertices if v.select]
-            nonselectedverts = [v for v in vertices if not v.select]
-            vertexpairs = []
+            selectmask = np.empty(len(mesh.vertices), dtype=bool)
+            mesh.vertices.foreach_get('select', selectmask)
             
-            for v1 in selectedverts:
-                candidates = nonselectedverts[:]
-                candidates.sort(key=lambda v2: (v2.co-(v1.co*negxvec)).length)
-                v2 = candidates[0]
-                
-                if (v2.co-(v1.co*negxvec)).length <= 0.01:
-                    vertexpairs.append((v1, v2))
-            
-            for v1, v2 in vertexpairs:
-                if v2.co != v1.co*negxvec:
-                    hits += 1
-                    v2.co[:] = v1.co*negxvec
+            sources, targets = mirrormap.MatchPairs('VERTEX', np.flatnonzero(selectmask), ~selectmask)
+            hits += MirrorVertexPositions(mesh, mirrormap, sources, targets)
         
         bpy.ops.object.mode_set(mode='EDIT')
         
@@ -524,6 +734,7 @@ class DMR_OT_MatchMirrorUVs(bpy.types.Operator):
         ('LEFT', 'Left', "Flip on leftmost loop"),
         ('RIGHT', 'Right', "Flip on rightmost loop"),
     ))
+    all_layers : bpy.props.BoolProperty(name="All UV Layers", description="Mirror every UV layer instead of only the active layer", default=False)
 
     @classmethod
     def poll(cls, context):
@@ -534,55 +745,42 @@ class DMR_OT_MatchMirrorUVs(bpy.types.Operator):
         
         offset = self.offset
         
-        thresh = thresh*thresh
-        sqr = lambda x: (x*x)
-        MirroredDistance = lambda v1,v2: ( sqr(v2[0]+v1[0]) + sqr(v2[1]-v1[1]) + sqr(v2[2]-v1[2]) )
-        
         bpy.ops.object.mode_set(mode='OBJECT')
         for obj in context.selected_objects:
-            if obj.type != 'MESH':
+            if obj.type != 'MESH' or not obj.data.uv_layers.active:
                 continue
             
-            uvlayer = obj.data.uv_layers.active
+            mesh = obj.data
+            mirrormap = GetMirrorMap(mesh)
             
-            loops = tuple(obj.data.loops)
-            vertices = tuple(obj.data.vertices)
-            polygons = tuple(obj.data.polygons)
+            # Source loops are in selected polygons on +X side
+            polyselect = np.empty(len(mesh.polygons), dtype=bool)
+            mesh.polygons.foreach_get('select', polyselect)
+            polyselect &= mirrormap.Points('POLYGON')[0][:, 0] > 0
             
-            selectedpolys = tuple(p for p in obj.data.polygons if p.select)
-            polypairs = {
-                p1: p2 
-                for p1 in polygons if (p1.select and p1.center[0] > 0)
-                for p2 in polygons if (
-                    MirroredDistance(p1.center, p2.center) <= thresh
-                )
-            }
-            loopco = {l.index: vertices[l.vertex_index].co for l in loops}
-            
-            targetuvs = []
-            
-            for p1, p2 in polypairs.items():
-                for l1 in p1.loop_indices:
-                    for l2 in p2.loop_indices:
-                        if MirroredDistance(loopco[l1], loopco[l2]) <= thresh:
-                            targetuvs.append(uvlayer.data[l2])
-                            uvlayer.data[l2].uv = uvlayer.data[l1].uv
-                            break
-            
-            if targetuvs:
-                if self.flip == 'LEFT':
-                    point = min([l.uv[0] for l in targetuvs if l.uv[0] != 0.0])
-                    for l in targetuvs:
-                        l.uv[0] = point-(l.uv[0]-point)
+            loopmap = mirrormap.LoopMap(thresh)
+            sources = np.flatnonzero(np.repeat(polyselect, mirrormap.looptotals) & (loopmap >= 0))
+            targets = loopmap[sources]
+            
+            if len(targets) == 0:
+                continue
+            
+            targetloops = np.unique(targets)
+            uvlayers = tuple(mesh.uv_layers) if self.all_layers else (mesh.uv_layers.active,)
+            
+            for uvlayer in uvlayers:
+                uvs = ReadDataValues(uvlayer.data, 'uv', 2)
+                uvs[targets] = uvs[sources]
                 
-                elif self.flip == 'RIGHT':
-                    point = max([l.uv[0] for l in targetuvs if l.uv[0] != 0.0])
-                    for l in targetuvs:
-                        l.uv[0] = point-(l.uv[0]-point)
+                if self.flip != 'NONE':
+                    u = uvs[targetloops, 0]
+                    nonzero = u[u != 0.0]
+                    if len(nonzero):
+                        point = nonzero.min() if self.flip == 'LEFT' else nonzero.max()
+                        uvs[targetloops, 0] = point-(u-point)
                 
-                for uv in targetuvs:
-                    uv.uv[0] += offset[0]
-                    uv.uv[1] += offset[1]
+                uvs[targetloops] += np.array(offset, dtype=np.float32)
+                uvlayer.data.foreach_set('uv', uvs.ravel())
                 
         bpy.ops.object.mode_set(mode='EDIT')
         return {'FINISHED'}
@@ -774,10 +972,17 @@ classlist.append(DMR_OT_FixVertexGroupSides)
 def register():
     for c in classlist:
         bpy.utils.register_class(c)
+    
+    bpy.app.handlers.load_post.append(MirrorMapsLoadPost)
 
 def unregister():
+    if MirrorMapsLoadPost in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(MirrorMapsLoadPost)
+    
     for c in list(classlist)[::-1]:
         bpy.utils.unregister_class(c)
+    
+    MIRRORMAPS.clear()
 
 if __name__ == "__main__":
     register()
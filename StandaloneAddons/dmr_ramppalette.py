@@ -1,6 +1,7 @@
 import bpy
 import mathutils
 import math
+import numpy as np
 
 from bpy_extras.io_utils import ExportHelper, ImportHelper
 
@@ -30,6 +31,135 @@ def LinkNodes(ndtree, n1, output_index, n2, input_index):
         (ndtree.nodes[n2] if isinstance(n2, str) else n2).inputs[input_index]
         )
 
+# ----------------------------------------------------------------
+
+# Returns array of loop indices for selection. Must be called in Object mode
+#   'FACE':   Loops of selected faces. Falls back to 'VERTEX' when no faces are selected
+#   'VERTEX': Loops of visible faces at selected vertices
+#   'MIXED':  Loops of selected faces, plus loops of visible faces at selected vertices not used by selected faces
+def ResolveTargetLoops(mesh, mode='FACE'):
+    numpolys = len(mesh.polygons)
+    polyselect = np.empty(numpolys, dtype=bool)
+    polyhide = np.empty(numpolys, dtype=bool)
+    looptotals = np.empty(numpolys, dtype=np.int32)
+    mesh.polygons.foreach_get('select', polyselect)
+    mesh.polygons.foreach_get('hide', polyhide)
+    mesh.polygons.foreach_get('loop_total', looptotals)
+    polyselect &= ~polyhide
+    
+    faceloops = np.repeat(polyselect, looptotals)
+    
+    if mode == 'FACE' and polyselect.any():
+        return np.flatnonzero(faceloops)
+    
+    numverts = len(mesh.vertices)
+    vertexselect = np.empty(numverts, dtype=bool)
+    vertexhide = np.empty(numverts, dtype=bool)
+    loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.vertices.foreach_get('select', vertexselect)
+    mesh.vertices.foreach_get('hide', vertexhide)
+    mesh.loops.foreach_get('vertex_index', loopverts)
+    vertexselect &= ~vertexhide
+    
+    vertexloops = np.repeat(~polyhide, looptotals) & vertexselect[loopverts]
+    
+    if mode == 'MIXED':
+        usedverts = np.zeros(numverts, dtype=bool)
+        usedverts[loopverts[faceloops]] = True
+        vertexloops = faceloops | (vertexloops & ~usedverts[loopverts])
+    
+    return np.flatnonzero(vertexloops)
+
+# ----------------------------------------------------------------
+
+# Returns (n, 4) array of color attribute values
+def ReadColorData(lyr):
+    colors = np.empty(len(lyr.data)*4, dtype=np.float32)
+    lyr.data.foreach_get('color', colors)
+    return colors.reshape(-1, 4)
+
+# Returns index of nearest palette color for each color. Distances are computed in chunks of rows
+def NearestColorIndices(colors, palette, chunk=65536):
+    palette = np.asarray(palette, dtype=np.float32)
+    colors = np.asarray(colors, dtype=np.float32)[:, :palette.shape[1]]
+    indices = np.empty(len(colors), dtype=np.int32)
+    
+    for i in range(0, len(colors), chunk):
+        diff = colors[i:i+chunk, None, :] - palette[None, :, :]
+        indices[i:i+chunk] = (diff*diff).sum(axis=2).argmin(axis=1)
+    return indices
+
+# Returns (colors, counts) of unique rgb colors quantized to levels per channel, most common first.
+# Each color is the mean of the colors sharing its quantized key
+def ColorHistogram(colors, levels=1024):
+    if len(colors) == 0:
+        return (np.empty((0, 3), dtype=np.float32), np.empty(0, dtype=np.int64))
+    
+    q = np.clip(np.rint(colors[:, :3] * (levels-1)), 0, levels-1).astype(np.int64)
+    keys = (q[:, 0] * levels + q[:, 1]) * levels + q[:, 2]
+    keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    
+    means = np.stack([
+        np.bincount(inverse, weights=colors[:, c], minlength=len(keys))
+        for c in range(3)
+        ], axis=1) / counts[:, None]
+    
+    order = np.argsort(-counts, kind='stable')
+    return (means[order].astype(np.float32), counts[order])
+
+# Returns (colors, counts) reduced to k colors by weighted k-means, most common first
+def KMeansPalette(colors, counts, k, iterations=16):
+    if len(colors) <= k:
+        return (colors, counts)
+    
+    colors = colors.astype(np.float64)
+    weights = counts.astype(np.float64)
+    centers = colors[:k].copy()    # Start from most common colors
+    
+    for i in range(iterations):
+        labels = NearestColorIndices(colors, centers)
+        totals = np.bincount(labels, weights=weights, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=colors[:, c]*weights, minlength=k) for c in range(3)], axis=1)
+        
+        used = totals > 0
+        newcenters = centers.copy()
+        newcenters[used] = sums[used] / totals[used, None]
+        
+        if np.allclose(newcenters, centers):
+            break
+        centers = newcenters
+    
+    totals = np.bincount(NearestColorIndices(colors, centers), weights=weights, minlength=k)
+    order = np.argsort(-totals, kind='stable')
+    return (centers[order].astype(np.float32), totals[order].astype(np.int64))
+
+# Returns (colors, counts) reduced to k colors by weighted median cut, most common first
+def MedianCutPalette(colors, counts, k):
+    if len(colors) <= k:
+        return (colors, counts)
+    
+    boxes = [np.arange(len(colors))]
+    
+    while len(boxes) < k:
+        # Split box with widest channel range at weighted median
+        ranges = [np.ptp(colors[box], axis=0).max() if len(box) > 1 else -1.0 for box in boxes]
+        index = int(np.argmax(ranges))
+        if ranges[index] <= 0.0:
+            break
+        
+        box = boxes.pop(index)
+        channel = np.ptp(colors[box], axis=0).argmax()
+        box = box[np.argsort(colors[box, channel], kind='stable')]
+        cumulative = np.cumsum(counts[box])
+        split = min(max(int(np.searchsorted(cumulative, cumulative[-1] / 2)) + 1, 1), len(box)-1)
+        boxes += [box[:split], box[split:]]
+    
+    centers = np.array([np.average(colors[box], axis=0, weights=counts[box]) for box in boxes], dtype=np.float32)
+    totals = np.array([counts[box].sum() for box in boxes], dtype=np.int64)
+    order = np.argsort(-totals, kind='stable')
+    return (centers[order], totals[order])
+
 classlist = []
 
 # =====================================================================================
@@ -378,17 +508,43 @@ class RampPalette_NodeGroup(bpy.types.PropertyGroup):
         for obj in objects:
             if obj.type == 'MESH':
                 if obj.data.color_attributes and 'palette' in list(obj.data.uv_layers.keys()):
-                    lyr = obj.data.color_attributes.active_color
-                    uvlyr = obj.data.uv_layers['palette']
+                    mesh = obj.data
+                    lyr = mesh.color_attributes.active_color
+                    uvlyr = mesh.uv_layers['palette']
+                    
+                    targetloops = ResolveTargetLoops(mesh, 'VERTEX')
+                    if len(targetloops) == 0:
+                        continue
+                    
+                    uvs = np.empty(len(uvlyr.data)*2, dtype=np.float32)
+                    uvlyr.data.foreach_get('uv', uvs)
+                    colors = np.empty(len(lyr.data)*4, dtype=np.float32)
+                    lyr.data.foreach_get('color', colors)
+                    colors = colors.reshape(-1, 4)
                     
-                    targetvertices = tuple([v.index for v in obj.data.vertices if v.select])
-                    targetloops = [l for p in obj.data.polygons if (p.select and not p.hide) for l in p.loop_indices]
-                    targetloops += [l.index for l in obj.data.loops if l.vertex_index in targetvertices]
+                    targetcolors = self.EvaluateColors(uvs[0::2][targetloops])
                     
-                    for l in targetloops:
-                        lyr.data[l].color = self.EvaluateColor(uvlyr.data[l].uv[0])
+                    if lyr.domain == 'POINT':
+                        loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+                        mesh.loops.foreach_get('vertex_index', loopverts)
+                        colors[loopverts[targetloops]] = targetcolors
+                    else:
+                        colors[targetloops] = targetcolors
+                    
+                    lyr.data.foreach_set('color', colors.ravel())
         
         bpy.ops.object.mode_set(mode=mode)
+    
+    # Returns (n, 4) array of ramp colors for array of x positions
+    def EvaluateColors(self, x, slot_index=None):
+        if slot_index == None:
+            slot_index = self.ramp_index
+        
+        colors = np.array([element.color for element in self.slots[slot_index].colors], dtype=np.float32).reshape(-1, 4)
+        
+        pos = np.clip(x * self.width - 0.5, 0, self.width-1)
+        amt = (pos - np.floor(pos))[:, None]
+        return colors[np.floor(pos).astype(np.int32)] * (1.0-amt) + colors[np.ceil(pos).astype(np.int32)] * amt
         
     def EvaluateColor(self, x, slot_index=None):
         if slot_index == None:
@@ -404,46 +560,61 @@ class RampPalette_NodeGroup(bpy.types.PropertyGroup):
         return mathutils.Vector(col1).lerp(col2, amt)
     
     def FindColorIndex(self, colorvec):
-        colorvec = mathutils.Vector(colorvec)
-        vecsize = len(colorvec)
-        slotcolors = [(i, mathutils.Vector(element.color)) for i,element in enumerate(self.ActiveSlot().colors)]
-        slotcolors.sort(key=lambda x: (mathutils.Vector(x[1][:vecsize])-colorvec).length_squared)
-        
-        return slotcolors[0][0]
+        return int(self.FindColorIndices([colorvec])[0])
+    
+    # Returns array of nearest active slot color index for each row of colors
+    def FindColorIndices(self, colors):
+        colors = np.asarray(colors, dtype=np.float32)
+        palette = np.array([element.color for element in self.ActiveSlot().colors], dtype=np.float32).reshape(-1, 4)
+        return NearestColorIndices(colors, palette[:, :colors.shape[1]])
     
-    def BuildFromObjects(self, objects, use_polygons=True):
+    def BuildFromObjects(self, objects, use_polygons=True, reduce='COUNT', levels=1024):
         objects = [obj for obj in objects if obj.type == 'MESH']
         
         allcolors = [
-            mathutils.Vector(vc.color[:3])
+            ReadColorData(obj.data.color_attributes.active_color)
             for obj in objects if obj.data.color_attributes.active_color
-            for vc in obj.data.color_attributes.active_color.data
         ]
+        allcolors = np.concatenate(allcolors) if allcolors else np.empty((0, 4), dtype=np.float32)
         
-        for c in allcolors:
-            c.freeze()
+        uniquecolors, counts = ColorHistogram(allcolors, levels)
         
-        uniquecolors = list(set(allcolors))
-        uniquecolors.sort(key=lambda vc: -allcolors.count(vc))
+        if reduce == 'KMEANS':
+            uniquecolors, counts = KMeansPalette(uniquecolors, counts, self.width)
+        elif reduce == 'MEDIAN_CUT':
+            uniquecolors, counts = MedianCutPalette(uniquecolors, counts, self.width)
         
-        print([allcolors.count(vc) for vc in uniquecolors][:20])
+        print(counts[:20].tolist())
         
         for i, element in enumerate(self.ActiveSlot().colors[:min(self.width, len(uniquecolors))]):
-            element.color = list(uniquecolors[i]) + [1]*(4-len(uniquecolors[i]))
+            element.color = uniquecolors[i].tolist() + [1]
     
     def VCToUVs(self, objects):
         objects = [obj for obj in objects if obj.type == 'MESH']
         
         for obj in objects:
-            uvlayers = obj.data.uv_layers
+            mesh = obj.data
+            vclyr = mesh.color_attributes.active_color
+            if not vclyr:
+                continue
+            
+            uvlayers = mesh.uv_layers
             if "palette" not in uvlayers.keys():
-                for uv in uvlayers.new(name="palette").data:
-                    uv.uv = (0, 0)
+                lyr = uvlayers.new(name="palette")
+                lyr.data.foreach_set('uv', np.zeros(len(lyr.data)*2, dtype=np.float32))
             uvlyr = uvlayers["palette"].data
-            vclyr = obj.data.color_attributes.active_color.data
             
-            for l in range(0, len(uvlyr)):
-                uvlyr[l].uv[0] = (self.FindColorIndex(vclyr[l].color[:3]) + 0.5) / self.width
+            colors = ReadColorData(vclyr)[:, :3]
+            if vclyr.domain == 'POINT':
+                loopverts = np.empty(len(mesh.loops), dtype=np.int32)
+                mesh.loops.foreach_get('vertex_index', loopverts)
+                colors = colors[loopverts]
+            
+            uvs = np.empty(len(uvlyr)*2, dtype=np.float32)
+            uvlyr.foreach_get('uv', uvs)
+            uvs = uvs.reshape(-1, 2)
+            uvs[:, 0] = (self.FindColorIndices(colors) + 0.5) / self.width
+            uvlyr.foreach_set('uv', uvs.ravel())
         
 classlist.append(RampPalette_NodeGroup)
 
@@ -628,29 +799,18 @@ class RAMPPALETTE_OP_Set_UV(RampPalette_OP):
                 continue
             if "palette" not in obj.data.uv_layers:
                 lyr = obj.data.uv_layers.new(name="palette")
-                for uv in lyr.data:
-                    uv.uv = (0, 0)
+                lyr.data.foreach_set('uv', np.zeros(len(lyr.data)*2, dtype=np.float32))
             lyrdata = obj.data.uv_layers['palette'].data
             
-            vertices = tuple(obj.data.vertices)
-            loops = tuple(obj.data.loops)
-            
-            looppool = [l for p in obj.data.polygons if (not p.hide) for l in p.loop_indices]
-            targetpolys = tuple([p for p in obj.data.polygons if (p.select and not p.hide)])
-            usedvertices = tuple([v for p in targetpolys for v in p.vertices])
-            targetloops = [l for p in targetpolys for l in p.loop_indices]
-            targetloops += [l.index for l in loops if (vertices[l.vertex_index].select and l.vertex_index not in usedvertices)]
-            
-            targetloops = [l for l in targetloops if l in looppool]
+            targetloops = ResolveTargetLoops(obj.data, 'MIXED')
             
             print(len(targetloops))
             
-            if self.coordinate == 'X':
-                for l in tuple(targetloops):
-                    lyrdata[l].uv[0] = palvalue
-            else:
-                for l in tuple(targetloops):
-                    lyrdata[l].uv[1] = palvalue
+            uvs = np.empty(len(lyrdata)*2, dtype=np.float32)
+            lyrdata.foreach_get('uv', uvs)
+            uvs = uvs.reshape(-1, 2)
+            uvs[targetloops, 0 if self.coordinate == 'X' else 1] = palvalue
+            lyrdata.foreach_set('uv', uvs.ravel())
         
         bpy.ops.object.mode_set(mode=mode)
         return {'FINISHED'}
@@ -841,8 +1001,15 @@ class RAMPPALETTE_OP_BuildFromVC(bpy.types.Operator):
     bl_label = "Build Slot From VC"
     bl_options = {'REGISTER', 'UNDO'}
     
+    reduce : bpy.props.EnumProperty(name="Reduce", default='COUNT', items=(
+        ('COUNT', "Most Common", "Use most common colors"),
+        ('KMEANS', "K-Means", "Cluster colors to palette width with k-means"),
+        ('MEDIAN_CUT', "Median Cut", "Split colors to palette width with median cut"),
+    ))
+    levels : bpy.props.IntProperty(name="Levels", default=1024, min=2, max=65536, description="Quantization levels per channel when counting colors")
+    
     def execute(self, context):
-        context.scene.ramp_palettes.Active().BuildFromObjects(context.selected_objects)
+        context.scene.ramp_palettes.Active().BuildFromObjects(context.selected_objects, reduce=self.reduce, levels=self.levels)
         return {'FINISHED'}
 classlist.append(RAMPPALETTE_OP_BuildFromVC)
 
@@ -0,0 +1,83 @@
+import importlib.util
+import os
+import sys
+import types
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Minimal bpy/mathutils so the addon module can be imported outside of Blender
+def InstallBlenderStubs():
+    if 'bpy' in sys.modules:
+        return
+    
+    class Prop:
+        def __init__(self, *args, **kwargs):
+            pass
+    
+    bpy = types.ModuleType('bpy')
+    bpy.types = types.SimpleNamespace(Operator=object, Panel=object, Menu=object, PropertyGroup=object, UIList=object)
+    bpy.props = types.SimpleNamespace(**{
+        name: Prop for name in (
+            'BoolProperty', 'IntProperty', 'FloatProperty', 'StringProperty', 'EnumProperty',
+            'FloatVectorProperty', 'IntVectorProperty', 'BoolVectorProperty', 'PointerProperty', 'CollectionProperty',
+        )
+    })
+    bpy.app = types.SimpleNamespace(handlers=types.SimpleNamespace(persistent=lambda fn: fn, load_post=[]))
+    bpy.utils = types.SimpleNamespace(register_class=lambda c: None, unregister_class=lambda c: None)
+    
+    mathutils = types.ModuleType('mathutils')
+    mathutils.kdtree = types.ModuleType('mathutils.kdtree')
+    
+    sys.modules['bpy'] = bpy
+    sys.modules['mathutils'] = mathutils
+    sys.modules['mathutils.kdtree'] = mathutils.kdtree
+
+def LoadAddon(name):
+    InstallBlenderStubs()
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, 'StandaloneAddons', name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class VGroup:
+    def __init__(self, index, name, lock_weight=False):
+        self.index = index
+        self.name = name
+        self.lock_weight = lock_weight
+
+def MakeGroups(*names):
+    return [VGroup(i, name) for i, name in enumerate(names)]
+
+class TestMirrorGroupTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mmm = LoadAddon('dmr_meshmirrormatch')
+    
+    def test_sided_pairs(self):
+        table = self.mmm.MirrorGroupTable(MakeGroups('arm.L', 'arm.R', 'spine', 'leg_l', 'leg_r'))
+        self.assertEqual(table.tolist(), [1, 0, -1, 4, 3])
+    
+    def test_numbered_duplicate_does_not_replace_original(self):
+        table = self.mmm.MirrorGroupTable(MakeGroups('arm.L', 'arm.R', 'spine', 'leg_l', 'leg_r', 'arm.L.001'))
+        self.assertEqual(table.tolist(), [1, 0, -1, 4, 3, -1])
+    
+    def test_original_after_numbered_duplicate(self):
+        table = self.mmm.MirrorGroupTable(MakeGroups('arm.L.001', 'arm.R', 'arm.L'))
+        self.assertEqual(table.tolist(), [-1, 2, 1])
+    
+    def test_single_numbered_group_stands_in_for_base(self):
+        table = self.mmm.MirrorGroupTable(MakeGroups('arm.L.001', 'arm.R'))
+        self.assertEqual(table.tolist(), [1, 0])
+    
+    def test_ambiguous_numbered_groups_are_skipped(self):
+        table = self.mmm.MirrorGroupTable(MakeGroups('arm.L.001', 'arm.L.002', 'arm.R'))
+        self.assertEqual(table.tolist(), [-1, -1, -1])
+    
+    def test_locked_groups_are_skipped(self):
+        groups = MakeGroups('arm.L', 'arm.R')
+        groups[1].lock_weight = True
+        self.assertEqual(self.mmm.MirrorGroupTable(groups).tolist(), [-1, -1])
+
+if __name__ == '__main__':
+    unittest.main()